@@ -137,6 +137,16 @@ class _ChatScreenState extends State<ChatScreen> {
       });
     };
 
+    _wsService.onPresenceSnapshot = (userIds, online) {
+      setState(() {
+        for (var user in _users) {
+          if (userIds.contains(user['id'])) {
+            user['is_online'] = online.contains(user['id']);
+          }
+        }
+      });
+    };
+
     _wsService.connect(userId);
   }
 
@@ -164,6 +174,9 @@ class _ChatScreenState extends State<ChatScreen> {
           }
         }
       });
+
+      // only listen to presence of listed users
+      _wsService.subscribePresence(_users.map((u) => u['id'] as int));
     } catch (e) {
       setState(() => _error = 'Kullanıcılar yüklenemedi: $e');
     }
@@ -243,10 +256,27 @@ class _ChatScreenState extends State<ChatScreen> {
       );
       print('   ==============================\n');
 
+      // same client id on both paths, so an HTTP retry never duplicates
+      final clientId = _wsService.newClientId();
+
+      if (_wsService.isConnected) {
+        try {
+          await _wsService.sendChatMessage(
+            receiverId: _selectedUserId!,
+            encryptedContent: encryptedMessage,
+            clientId: clientId,
+          );
+          return;
+        } catch (e) {
+          print('WS send failed, falling back to HTTP: $e');
+        }
+      }
+
       final ok = await ApiService.sendMessage(
         senderId: userId,
         receiverId: _selectedUserId!,
         encryptedContent: encryptedMessage,
+        clientMessageId: clientId,
       );
 
       if (!ok) {
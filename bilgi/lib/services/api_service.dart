@@ -11,6 +11,18 @@ class ApiService {
   static String get serverIp => _serverIp;
   static set serverIp(String ip) => _serverIp = ip;
 
+  // signed session token from /login; sent only as a Bearer header (HTTP requests and the
+  // WebSocket handshake). Never put it in a URL: query strings end up in access logs
+  static String? _token;
+  static String? get token => _token;
+
+  static Map<String, String> _authHeaders([Map<String, String>? headers]) {
+    return {
+      ...?headers,
+      if (_token != null) 'Authorization': 'Bearer $_token',
+    };
+  }
+
   static Future<Map<String, dynamic>?> login(
     String username,
     String password,
@@ -29,6 +41,7 @@ class ApiService {
 
       if (response.statusCode == 200) {
         final data = jsonDecode(response.body);
+        _token = data['token'] as String?;
         return {'user_id': data['user_id'], 'username': username};
       }
 
@@ -97,7 +110,7 @@ class ApiService {
         );
       }
 
-      final response = await http.get(uri);
+      final response = await http.get(uri, headers: _authHeaders());
 
       if (response.statusCode != 200) {
         print('GetUsers failed: ${response.statusCode}');
@@ -127,6 +140,7 @@ class ApiService {
     required int senderId,
     required int receiverId,
     required String encryptedContent,
+    String? clientMessageId,
   }) async {
     if (kMockApi) return true;
 
@@ -135,6 +149,7 @@ class ApiService {
         'sender_id': senderId,
         'receiver_id': receiverId,
         'encrypted_content': encryptedContent,
+        if (clientMessageId != null) 'client_message_id': clientMessageId,
       };
 
       print('\n📤 ===== MESAJ GÖNDERİLİYOR =====');
@@ -147,7 +162,7 @@ class ApiService {
 
       final response = await http.post(
         Uri.parse('$baseUrl/messages/send'),
-        headers: {'Content-Type': 'application/json'},
+        headers: _authHeaders({'Content-Type': 'application/json'}),
         body: jsonEncode(payload),
       );
 
@@ -179,6 +194,7 @@ class ApiService {
     try {
       final response = await http.get(
         Uri.parse('$baseUrl/messages/$myId/$otherId'),
+        headers: _authHeaders(),
       );
 
       if (response.statusCode != 200) {
@@ -213,7 +229,9 @@ class ApiService {
         Uri.parse(
           '$baseUrl/logout',
         ).replace(queryParameters: {'user_id': userId.toString()}),
+        headers: _authHeaders(),
       );
+      _token = null;
       return response.statusCode == 200;
     } catch (e) {
       print('Logout error: $e');
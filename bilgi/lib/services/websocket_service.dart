@@ -1,5 +1,7 @@
 import 'dart:async';
 import 'dart:convert';
+import 'dart:math';
+import 'package:web_socket_channel/io.dart';
 import 'package:web_socket_channel/web_socket_channel.dart';
 import 'api_service.dart';
 
@@ -11,9 +13,21 @@ class WebSocketService {
 
   Function(Map<String, dynamic>)? onMessageReceived;
   Function(int userId, String username, bool isOnline)? onStatusUpdate;
+  Function(List<int> userIds, Set<int> online)? onPresenceSnapshot;
   Function()? onConnected;
   Function()? onDisconnected;
 
+  // presence subscriptions, re-sent after reconnect
+  final Set<int> _presenceIds = {};
+
+  // last acked offline-queue id; the server resumes from here on reconnect
+  int? _lastPendingId;
+
+  // sends waiting for their ack, keyed by client_id
+  final Map<String, Completer<Map<String, dynamic>>> _pendingSends = {};
+  final Random _random = Random.secure();
+  int _sendCounter = 0;
+
   bool get isConnected => _channel != null;
 
   void connect(int userId) {
@@ -22,10 +36,20 @@ class WebSocketService {
     _userId = userId;
 
     try {
-      final uri = Uri.parse('$baseUrl/ws/$userId');
-      print('Connecting WebSocket: $uri');
+      final uri = Uri.parse('$baseUrl/ws/$userId').replace(
+        queryParameters: {
+          if (_lastPendingId != null) 'last_seen_id': '$_lastPendingId',
+        },
+      );
+      print('Connecting WebSocket: ws/$userId');
 
-      _channel = WebSocketChannel.connect(uri);
+      // token goes in the handshake header; query strings end up in access logs
+      _channel = IOWebSocketChannel.connect(
+        uri,
+        headers: {
+          if (ApiService.token != null) 'Authorization': 'Bearer ${ApiService.token}',
+        },
+      );
 
       _channel!.stream.listen(
         (data) => _handleIncomingMessage(data),
@@ -41,6 +65,10 @@ class WebSocketService {
 
       onConnected?.call();
       _startPingTimer();
+
+      if (_presenceIds.isNotEmpty) {
+        send({'type': 'subscribe', 'user_ids': _presenceIds.toList()});
+      }
     } catch (e) {
       print('WebSocket connection failed: $e');
       _handleDisconnect();
@@ -67,6 +95,37 @@ class WebSocketService {
           }
           break;
 
+        case 'presence':
+          final userIds = (message['user_ids'] as List?)?.cast<int>() ?? [];
+          final online = (message['online'] as List?)?.cast<int>() ?? [];
+          onPresenceSnapshot?.call(userIds, online.toSet());
+          break;
+
+        case 'pending':
+          final messages = (message['messages'] as List?) ?? [];
+          for (final item in messages) {
+            onMessageReceived?.call(Map<String, dynamic>.from(item as Map));
+          }
+
+          final lastId = message['last_id'] as int?;
+          if (lastId != null && messages.isNotEmpty) {
+            _lastPendingId = lastId;
+            send({'type': 'pending_ack', 'last_id': lastId});
+          }
+          break;
+
+        case 'ack':
+          final clientId = message['client_id'] as String?;
+          _pendingSends.remove(clientId)?.complete(message);
+          break;
+
+        case 'error':
+          final clientId = message['client_id'] as String?;
+          _pendingSends
+              .remove(clientId)
+              ?.completeError(Exception('Send failed: ${message['detail']}'));
+          break;
+
         case 'pong':
           // heartbeat response
           break;
@@ -79,7 +138,16 @@ class WebSocketService {
     }
   }
 
+  void _failPendingSends() {
+    final pending = Map.of(_pendingSends);
+    _pendingSends.clear();
+    for (final completer in pending.values) {
+      completer.completeError(StateError('WebSocket disconnected'));
+    }
+  }
+
   void _handleDisconnect() {
+    _failPendingSends();
     _channel = null;
     _pingTimer?.cancel();
     _pingTimer = null;
@@ -96,6 +164,56 @@ class WebSocketService {
     }
   }
 
+  void subscribePresence(Iterable<int> userIds) {
+    final newIds = userIds.where((id) => !_presenceIds.contains(id)).toList();
+    if (newIds.isEmpty) return;
+
+    _presenceIds.addAll(newIds);
+    send({'type': 'subscribe', 'user_ids': newIds});
+  }
+
+  void unsubscribePresence(Iterable<int> userIds) {
+    final removed = userIds.where(_presenceIds.remove).toList();
+    if (removed.isEmpty) return;
+
+    send({'type': 'unsubscribe', 'user_ids': removed});
+  }
+
+  String newClientId() {
+    final stamp = DateTime.now().microsecondsSinceEpoch.toRadixString(36);
+    final nonce = _random.nextInt(1 << 32).toRadixString(36);
+    return '$stamp-$nonce-${(_sendCounter++).toRadixString(36)}';
+  }
+
+  // Sends without waiting for earlier acks; the server processes them in order.
+  Future<Map<String, dynamic>> sendChatMessage({
+    required int receiverId,
+    required String encryptedContent,
+    required String clientId,
+    Duration timeout = const Duration(seconds: 10),
+  }) {
+    if (_channel == null) {
+      return Future.error(StateError('WebSocket not connected'));
+    }
+
+    final completer = Completer<Map<String, dynamic>>();
+    _pendingSends[clientId] = completer;
+    send({
+      'type': 'send',
+      'client_id': clientId,
+      'receiver_id': receiverId,
+      'encrypted_content': encryptedContent,
+    });
+
+    return completer.future.timeout(
+      timeout,
+      onTimeout: () {
+        _pendingSends.remove(clientId);
+        throw TimeoutException('No ack for $clientId');
+      },
+    );
+  }
+
   Timer? _pingTimer;
 
   void _startPingTimer() {
@@ -110,6 +228,7 @@ class WebSocketService {
   }
 
   void disconnect() {
+    _failPendingSends();
     _pingTimer?.cancel();
     _pingTimer = null;
     _channel?.sink.close();
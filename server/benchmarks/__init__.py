@@ -0,0 +1 @@
+# Performans ölçümleri: server dizininden `python -m benchmarks.<modül>` ile çalıştırılır
@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+import httpx
+
+from benchmarks.load import BenchUser, rss_mb, server_process
+from benchmarks.send_under_register_load import make_stego_png
+from services.crypto_service import StreamDecryptor, iter_encrypt
+
+
+# Büyük ek aktarımı: parçalı yükleme, alıcı anahtarına akış halinde çevirme ve indirme.
+# Sunucunun tepe belleği dosya boyutuyla büyümemeli (ayrı uvicorn süreci, /proc üzerinden ölçülür).
+# Kullanım (server dizininden): python -m benchmarks.attachment_transfer --size-mb 256
+
+PLAIN_BLOCK_BYTES = 1024 * 1024
+
+
+def plaintext_blocks(size: int):
+    block = bytes(range(256)) * (PLAIN_BLOCK_BYTES // 256)
+    for offset in range(0, size, PLAIN_BLOCK_BYTES):
+        yield block[:min(PLAIN_BLOCK_BYTES, size - offset)]
+
+
+def upload_chunks(size: int, password: str, chunk_bytes: int):
+    # İstemci de akış halinde şifreler; yükleme isteği başına chunk_bytes
+    pending = bytearray()
+    for piece in iter_encrypt(plaintext_blocks(size), password):
+        pending += piece
+        while len(pending) >= chunk_bytes:
+            yield bytes(pending[:chunk_bytes])
+            del pending[:chunk_bytes]
+    if pending:
+        yield bytes(pending)
+
+
+def encrypted_size(size: int, password: str) -> int:
+    return sum(len(piece) for piece in iter_encrypt(plaintext_blocks(size), password))
+
+
+async def transfer(base_url: str, size: int, chunk_bytes: int) -> dict:
+    tag = uuid.uuid4().hex[:8]
+    sender = BenchUser(f"bench_{tag}_s", "sender12", make_stego_png("sender12", 64, 64))
+    receiver = BenchUser(f"bench_{tag}_r", "recv5678", make_stego_png("recv5678", 64, 64))
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        for user in (sender, receiver):
+            await user.register(client)
+            await user.login(client)
+
+        total = encrypted_size(size, sender.password)
+        response = await client.post("/attachments", headers=sender.headers, json={
+            "receiver_id": receiver.user_id, "file_name": "bench.bin", "size": total
+        })
+        response.raise_for_status()
+        attachment_id = response.json()["attachment_id"]
+
+        start = time.perf_counter()
+        offset = 0
+        for chunk in upload_chunks(size, sender.password, chunk_bytes):
+            response = await client.put(
+                f"/attachments/{attachment_id}/content", params={"offset": offset},
+                headers=sender.headers, content=chunk
+            )
+            response.raise_for_status()
+            offset = response.json()["received_size"]
+        results["attachment_upload_mb_per_s"] = size / 1e6 / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        response = await client.post(f"/attachments/{attachment_id}/complete", headers=sender.headers)
+        response.raise_for_status()
+        results["attachment_reencrypt_mb_per_s"] = size / 1e6 / (time.perf_counter() - start)
+
+        # İndirilen içerik alıcının anahtarıyla parça parça doğrulanır
+        start = time.perf_counter()
+        decryptor = StreamDecryptor(receiver.password)
+        received = 0
+        async with client.stream("GET", f"/attachments/{attachment_id}/content", headers=receiver.headers) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                received += len(decryptor.update(chunk))
+        received += len(decryptor.finalize())
+        if received != size:
+            raise RuntimeError(f"Downloaded {received} of {size} bytes")
+        results["attachment_download_mb_per_s"] = size / 1e6 / (time.perf_counter() - start)
+    return results
+
+
+def run(size_mb: int = 64, chunk_mb: int = 8) -> dict:
+    # Sunucu süreci ortamı bu süreçten kopyalar; boyut sınırı dosyaya göre açılır
+    os.environ["ATTACHMENT_MAX_BYTES"] = str(2 * size_mb * 1024 * 1024)
+    with server_process() as (base_url, process):
+        baseline = rss_mb(process.pid, "VmRSS")
+        results = asyncio.run(transfer(base_url, size_mb * 1024 * 1024, chunk_mb * 1024 * 1024))
+        peak = rss_mb(process.pid)
+        if baseline is not None and peak is not None:
+            results["attachment_server_rss_growth_mb"] = peak - baseline
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--chunk-mb", type=int, default=8)
+    args = parser.parse_args()
+    for name, value in run(args.size_mb, args.chunk_mb).items():
+        print(f"{name:<36} {value:>12.2f}")
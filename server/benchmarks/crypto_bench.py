@@ -0,0 +1,69 @@
+import base64
+import timeit
+
+from Crypto.Cipher import DES
+
+from services.crypto_service import des_encrypt, des_decrypt
+
+
+PASSWORD = "12345678"
+PAYLOAD_SIZES = [16, 1024, 64 * 1024]
+
+
+# Önbelleksiz eski uygulama: her çağrıda anahtar hazırlığı ve liste ile dolgu
+def legacy_pad_password(password: str) -> bytes:
+    password_bytes = password.encode('utf-8')
+    key = bytearray(8)
+    for i in range(8):
+        if i < len(password_bytes):
+            key[i] = password_bytes[i]
+        else:
+            key[i] = 0x00
+    return bytes(key)
+
+
+def legacy_des_encrypt(plain_text: str, password: str) -> str:
+    key = legacy_pad_password(password)
+    plain_bytes = plain_text.encode('utf-8')
+    padding_length = 8 - (len(plain_bytes) % 8)
+    padded_data = plain_bytes + bytes([padding_length] * padding_length)
+    cipher = DES.new(key, DES.MODE_ECB)
+    return base64.b64encode(cipher.encrypt(padded_data)).decode('utf-8')
+
+
+def legacy_des_decrypt(cipher_b64: str, password: str) -> str:
+    key = legacy_pad_password(password)
+    cipher = DES.new(key, DES.MODE_ECB)
+    data = cipher.decrypt(base64.b64decode(cipher_b64))
+    padding_length = data[-1]
+    if 1 <= padding_length <= 8 and all(b == padding_length for b in data[-padding_length:]):
+        data = data[:-padding_length]
+    return data.decode('utf-8')
+
+
+def measure(func, arg, number: int) -> float:
+    # En iyi 5 tekrarın mesaj başına süresi (mikrosaniye)
+    best = min(timeit.repeat(lambda: func(arg, PASSWORD), number=number, repeat=5))
+    return best / number * 1e6
+
+
+def run():
+    print(f"{'payload':>10} | {'op':>7} | {'before (µs)':>12} | {'after (µs)':>11} | {'speedup':>7}")
+    print("-" * 60)
+    for size in PAYLOAD_SIZES:
+        plain = "a" * size
+        cipher_b64 = des_encrypt(plain, PASSWORD)
+        assert legacy_des_encrypt(plain, PASSWORD) == cipher_b64
+        number = max(10, 200000 // (size + 64))
+
+        for op, before, after, arg in (
+            ("encrypt", legacy_des_encrypt, des_encrypt, plain),
+            ("decrypt", legacy_des_decrypt, des_decrypt, cipher_b64),
+        ):
+            t_before = measure(before, arg, number)
+            t_after = measure(after, arg, number)
+            print(f"{size:>9}B | {op:>7} | {t_before:>12.2f} | {t_after:>11.2f} | {t_before / t_after:>6.2f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import json
+import time
+
+from services.connection_manager import ConnectionManager
+
+
+# Bellek içi sahte soketlerle durum yayını süresi: eski sıralı gönderim (broadcast_status) ve
+# PresenceService'in kullandığı kuyruklu gönderim (send_to_connections).
+# Kullanım (server dizininden): python -m benchmarks.fanout_bench --sockets 10000 --slow 10
+
+
+class FakeWebSocket:
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received = 0
+        self.done = None
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def _send(self):
+        # Ağ yazımı: hızlı istemci için tek bir olay döngüsü turu, yavaş istemci için gecikme
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)
+        self.received += 1
+        if self.done is not None and not self.done.done():
+            self.done.set_result(None)
+
+    async def send_text(self, data: str):
+        await self._send()
+
+    async def send_json(self, data: dict):
+        json.dumps(data)
+        await self._send()
+
+
+# Eski uygulama: her alıcıya sırayla send_json beklenir
+class LegacyConnectionManager:
+
+    def __init__(self):
+        self.active_connections = {}
+
+    async def connect(self, websocket, user_id: int):
+        await websocket.accept()
+        self.active_connections.setdefault(user_id, []).append(websocket)
+
+    async def send_personal_message(self, message: dict, user_id: int):
+        for connection in self.active_connections.get(user_id, []):
+            await connection.send_json(message)
+
+    async def broadcast_status(self, user_id: int, username: str, is_online: bool):
+        message = {"type": "status", "user_id": user_id, "username": username, "is_online": is_online}
+        for uid in list(self.active_connections.keys()):
+            await self.send_personal_message(message, uid)
+
+
+def make_sockets(count: int, slow: int, slow_delay: float):
+    return [FakeWebSocket(slow_delay if i < slow else 0.0) for i in range(count)]
+
+
+async def bench_legacy(count: int, slow: int, slow_delay: float):
+    manager = LegacyConnectionManager()
+    sockets = make_sockets(count, slow, slow_delay)
+    for user_id, ws in enumerate(sockets):
+        await manager.connect(ws, user_id)
+
+    start = time.perf_counter()
+    await manager.broadcast_status(0, "bench", True)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def bench_queued(count: int, slow: int, slow_delay: float, policy: str):
+    manager = ConnectionManager(queue_size=1, send_timeout=slow_delay / 2, overflow_policy=policy)
+    sockets = make_sockets(count, slow, slow_delay)
+    for user_id, ws in enumerate(sockets):
+        await manager.connect(ws, user_id)
+
+    # Yavaş istemcilerin kuyruğu önceden dolu: politika (bekle / düşür) devreye girer
+    for user_id in range(slow):
+        await manager.send_personal_message({"type": "warmup"}, user_id)
+        await manager.send_personal_message({"type": "warmup"}, user_id)
+
+    fast = sockets[slow:]
+    loop = asyncio.get_running_loop()
+    for ws in fast:
+        ws.done = loop.create_future()
+
+    connections = [c for conns in manager.active_connections.values() for c in conns]
+    message = {"type": "status", "user_id": 0, "username": "bench", "is_online": True}
+    start = time.perf_counter()
+    await manager.send_to_connections(message, connections)
+    enqueued = time.perf_counter() - start
+    await asyncio.gather(*(ws.done for ws in fast))
+    delivered = time.perf_counter() - start
+
+    await manager.close_all()
+    return enqueued, delivered
+
+
+async def run(count: int, slow: int, slow_delay: float):
+    print(f"sockets={count} slow={slow} slow_delay={slow_delay * 1000:.0f}ms")
+    print(f"{'mode':>14} | {'broadcast returns (ms)':>22} | {'fast clients done (ms)':>22}")
+    print("-" * 66)
+
+    results = [("legacy", await bench_legacy(count, slow, slow_delay))]
+    for policy in ("block", "drop"):
+        results.append((f"queued/{policy}", await bench_queued(count, slow, slow_delay, policy)))
+
+    for mode, (returned, delivered) in results:
+        print(f"{mode:>14} | {returned * 1000:>22.1f} | {delivered * 1000:>22.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--slow", type=int, default=10)
+    parser.add_argument("--slow-delay", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.sockets, args.slow, args.slow_delay))
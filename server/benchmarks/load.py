@@ -0,0 +1,266 @@
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+import httpx
+import websockets
+
+from benchmarks.send_under_register_load import make_stego_png, percentile
+from services.crypto_service import des_encrypt
+
+
+# Uçtan uca yük: uygulama ayrı bir uvicorn sürecinde (geçici SQLite veya verilen DATABASE_URL) çalışır.
+# N kullanıcı kayıt olur, giriş yapar, WebSocket açık tutar, mesaj gönderir (WS + HTTP) ve geçmiş yükler
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_TIMEOUT_SECONDS = 30
+DELIVERY_TIMEOUT_SECONDS = 30
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int, field: str = "VmHWM") -> Optional[float]:
+    # Linux: VmHWM tepe, VmRSS anlık yerleşik bellek
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+@contextmanager
+def server_process(database_url: Optional[str] = None):
+    with tempfile.TemporaryDirectory(prefix="securechat_bench_") as workdir:
+        env = dict(
+            os.environ,
+            DATABASE_URL=database_url or f"sqlite:///{workdir}/bench.db",
+            BLOB_STORE_DIR=os.path.join(workdir, "blobs"),
+            THUMBNAIL_DIR=os.path.join(workdir, "thumbnails"),
+            ATTACHMENT_DIR=os.path.join(workdir, "attachments"),
+            LOG_LEVEL="WARNING"
+        )
+        env.setdefault("SESSION_SECRET", secrets.token_hex(32))
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            cwd=SERVER_DIR,
+            env=env
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {process.returncode}")
+                try:
+                    httpx.get(base_url + "/", timeout=1).raise_for_status()
+                    break
+                except httpx.HTTPError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError("Server did not start")
+                    time.sleep(0.2)
+            yield base_url, process
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def summarize(name: str, latencies: list, elapsed: float) -> dict:
+    return {
+        f"load_{name}_per_s": len(latencies) / elapsed,
+        f"load_{name}_p50_ms": percentile(latencies, 50) * 1000,
+        f"load_{name}_p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def timed_phase(coroutines) -> tuple:
+    # Her eşyordam kendi gecikme listesini döner
+    start = time.perf_counter()
+    results = await asyncio.gather(*coroutines)
+    elapsed = time.perf_counter() - start
+    return [v for latencies in results for v in latencies], elapsed
+
+
+class BenchUser:
+
+    def __init__(self, username: str, password: str, image: bytes):
+        self.username = username
+        self.password = password
+        self.image = image
+        self.user_id = None
+        self.token = None
+        self.partner = None
+        self.websocket = None
+        self.reader = None
+        self.acks = {}
+        self.delivered = 0
+
+    async def register(self, client: httpx.AsyncClient) -> list:
+        start = time.perf_counter()
+        response = await client.post(
+            "/register",
+            data={"username": self.username},
+            files={"image": ("stego.png", self.image, "image/png")}
+        )
+        response.raise_for_status()
+        self.user_id = response.json()["user_id"]
+        return [time.perf_counter() - start]
+
+    async def login(self, client: httpx.AsyncClient) -> list:
+        start = time.perf_counter()
+        response = await client.post("/login", data={"username": self.username, "password": self.password})
+        response.raise_for_status()
+        self.token = response.json()["token"]
+        return [time.perf_counter() - start]
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def connect(self, ws_url: str):
+        self.websocket = await websockets.connect(f"{ws_url}/ws/{self.user_id}", extra_headers=self.headers)
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        async for data in self.websocket:
+            frame = json.loads(data)
+            kind = frame.get("type")
+            if kind in ("ack", "error"):
+                future = self.acks.pop(frame.get("client_id"), None)
+                if future is not None and not future.done():
+                    if kind == "ack":
+                        future.set_result(frame)
+                    else:
+                        future.set_exception(RuntimeError(frame.get("detail")))
+            elif kind == "message" and frame.get("receiver_id") == self.user_id:
+                self.delivered += 1
+            elif kind == "pending" and frame.get("messages"):
+                await self.websocket.send(json.dumps({"type": "pending_ack", "last_id": frame["last_id"]}))
+
+    async def ws_send(self, count: int) -> list:
+        latencies = []
+        content = des_encrypt("benchmark message", self.password)
+        for _ in range(count):
+            client_id = uuid.uuid4().hex
+            future = asyncio.get_running_loop().create_future()
+            self.acks[client_id] = future
+            start = time.perf_counter()
+            await self.websocket.send(json.dumps({
+                "type": "send",
+                "client_id": client_id,
+                "receiver_id": self.partner.user_id,
+                "encrypted_content": content
+            }))
+            await future
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    async def http_send(self, client: httpx.AsyncClient, count: int) -> list:
+        latencies = []
+        content = des_encrypt("benchmark message", self.password)
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.post("/messages/send", headers=self.headers, json={
+                "receiver_id": self.partner.user_id,
+                "encrypted_content": content
+            })
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    async def load_history(self, client: httpx.AsyncClient, pages: int) -> list:
+        latencies = []
+        for _ in range(pages):
+            start = time.perf_counter()
+            response = await client.get(
+                f"/messages/{self.user_id}/{self.partner.user_id}", params={"limit": 50}, headers=self.headers
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
+        if self.reader is not None:
+            self.reader.cancel()
+
+
+async def drive(base_url: str, users: int, messages: int, history_pages: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    tag = uuid.uuid4().hex[:8]
+    bench_users = []
+    for i in range(users):
+        password = f"pw{i:06d}"
+        bench_users.append(BenchUser(f"bench_{tag}_{i}", password, make_stego_png(password, 64, 64)))
+    # Her kullanıcının sabit bir sohbet ortağı (kendisi hariç)
+    for i, user in enumerate(bench_users):
+        user.partner = bench_users[(i + 1 + rng.randrange(users - 1)) % users]
+
+    results = {}
+    limits = httpx.Limits(max_connections=users + 4)
+    ws_url = base_url.replace("http://", "ws://", 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        latencies, elapsed = await timed_phase(u.register(client) for u in bench_users)
+        results.update(summarize("register", latencies, elapsed))
+
+        latencies, elapsed = await timed_phase(u.login(client) for u in bench_users)
+        results.update(summarize("login", latencies, elapsed))
+
+        await asyncio.gather(*(u.connect(ws_url) for u in bench_users))
+        try:
+            latencies, elapsed = await timed_phase(u.ws_send(messages) for u in bench_users)
+            results.update(summarize("ws_send", latencies, elapsed))
+
+            latencies, elapsed = await timed_phase(u.http_send(client, messages) for u in bench_users)
+            results.update(summarize("http_send", latencies, elapsed))
+
+            # Tüm canlı teslimatlar alıcılara ulaşmalı
+            expected = users * messages * 2
+            deadline = time.monotonic() + DELIVERY_TIMEOUT_SECONDS
+            while sum(u.delivered for u in bench_users) < expected and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            delivered = sum(u.delivered for u in bench_users)
+            if delivered < expected:
+                raise RuntimeError(f"Only {delivered}/{expected} messages delivered")
+
+            latencies, elapsed = await timed_phase(u.load_history(client, history_pages) for u in bench_users)
+            results.update(summarize("history", latencies, elapsed))
+        finally:
+            await asyncio.gather(*(u.close() for u in bench_users))
+    return results
+
+
+def run(users: int = 20, messages: int = 50, history_pages: int = 10, database_url: Optional[str] = None) -> dict:
+    with server_process(database_url) as (base_url, process):
+        results = asyncio.run(drive(base_url, users, messages, history_pages))
+        peak = rss_mb(process.pid)
+        if peak is not None:
+            results["load_server_peak_rss_mb"] = peak
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<36} {value:>12.2f}")
@@ -0,0 +1,53 @@
+import io
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from services.lsb_service import embed_payload, extract_payload, payload_capacity
+
+
+IMAGE_SIZES = [(256, 256), (1024, 1024), (2048, 2048)]
+BITS_PER_CHANNEL = [1, 2, 4]
+REPEAT = 3
+
+
+def best_of(func, *args) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run():
+    # Gömme: bellekteki resim -> resim (PNG kodlama hariç)
+    # Çıkarma: PNG baytları -> yük (PNG çözme dahil, sunucudaki gerçek yol)
+    print(f"{'image':>10} | {'bpc':>3} | {'payload':>10} | {'embed MB/s':>10} | {'extract MB/s':>12}")
+    print("-" * 58)
+    for width, height in IMAGE_SIZES:
+        pixels = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+        image = Image.fromarray(pixels, 'RGB')
+
+        for bits_per_channel in BITS_PER_CHANNEL:
+            payload = os.urandom(payload_capacity(width, height, bits_per_channel))
+            mb = len(payload) / 1e6
+
+            embed_time = best_of(embed_payload, image, payload, bits_per_channel)
+
+            buffer = io.BytesIO()
+            embed_payload(image, payload, bits_per_channel).save(buffer, 'PNG', compress_level=1)
+            png_bytes = buffer.getvalue()
+            assert extract_payload(png_bytes) == payload
+            extract_time = best_of(extract_payload, png_bytes)
+
+            print(
+                f"{width:>4}x{height:<5} | {bits_per_channel:>3} | {len(payload):>9}B | "
+                f"{mb / embed_time:>10.1f} | {mb / extract_time:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,73 @@
+import time
+
+from benchmarks.send_under_register_load import make_stego_png
+from services.crypto_service import des_encrypt, des_transcode_batch, iter_encrypt, iter_transcode
+from services.lsb_service import extract_password_from_image
+
+
+# Sunucusuz ölçümler: geçmiş yüklemedeki toplu DES dönüşümü ve kayıttaki LSB çıkarma.
+# Sonuç anahtarlarının soneki yönü belirler (_per_s büyük iyi, _ms / _us küçük iyi); bkz. benchmarks.suite
+
+REPEAT = 5
+# Kısa işlemler bu süreyi dolduracak kadar tekrarlanır (zamanlayıcı gürültüsü)
+MIN_REPEAT_SECONDS = 0.05
+SENDER_PASSWORD = "sender12"
+RECEIVER_PASSWORD = "recv5678"
+
+
+def best_of(func, repeat: int = REPEAT) -> float:
+    # Çağrı başına en iyi süre (saniye)
+    start = time.perf_counter()
+    func()
+    number = max(1, int(MIN_REPEAT_SECONDS / max(time.perf_counter() - start, 1e-9)))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def bench_des_transcode(batch: int = 500, size: int = 64) -> dict:
+    # Bir geçmiş sayfası: batch adet kısa mesaj, gönderen -> alıcı anahtarı
+    ciphers = [des_encrypt(f"{i:08d}".ljust(size, "x"), SENDER_PASSWORD) for i in range(batch)]
+    elapsed = best_of(lambda: des_transcode_batch(ciphers, SENDER_PASSWORD, RECEIVER_PASSWORD))
+    return {"des_transcode_msgs_per_s": batch / elapsed}
+
+
+def bench_des_transcode_large(size: int = 1 << 20) -> dict:
+    cipher = des_encrypt("a" * size, SENDER_PASSWORD)
+    elapsed = best_of(lambda: des_transcode_batch([cipher], SENDER_PASSWORD, RECEIVER_PASSWORD))
+    return {"des_transcode_large_mb_per_s": size / 1e6 / elapsed}
+
+
+def bench_stream_transcode_large(size: int = 1 << 20) -> dict:
+    # Akış biçimi, 64 KiB parçalar halinde gelen dosya gibi
+    encrypted = b"".join(iter_encrypt([b"a" * size], SENDER_PASSWORD))
+    chunks = [encrypted[i:i + 65536] for i in range(0, len(encrypted), 65536)]
+    elapsed = best_of(lambda: sum(len(c) for c in iter_transcode(chunks, SENDER_PASSWORD, RECEIVER_PASSWORD)))
+    return {"stream_transcode_large_mb_per_s": size / 1e6 / elapsed}
+
+
+def bench_lsb_extract(sizes=((256, 256), (2048, 2048))) -> dict:
+    # PNG çözme dahil (sunucudaki /register yolu)
+    results = {}
+    for width, height in sizes:
+        image_bytes = make_stego_png(SENDER_PASSWORD, width, height)
+        assert extract_password_from_image(image_bytes) == SENDER_PASSWORD
+        elapsed = best_of(lambda: extract_password_from_image(image_bytes))
+        results[f"lsb_extract_{width}x{height}_ms"] = elapsed * 1000
+    return results
+
+
+def run() -> dict:
+    results = {}
+    for bench in (bench_des_transcode, bench_des_transcode_large, bench_stream_transcode_large, bench_lsb_extract):
+        results.update(bench())
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<36} {value:>12.2f}")
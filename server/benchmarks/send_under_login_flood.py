@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+from benchmarks.send_under_register_load import login, make_stego_png, register, report, run_phase
+
+
+# Çalışan bir sunucuya karşı: /messages/send gecikmesi, eşzamanlı giriş seli varken ve yokken.
+# Sel, rastgele kullanıcı adları ve hatalı parolalarla scrypt doğrulamasını zorlar (429/503 beklenir).
+# Kullanım (server dizininden): python -m benchmarks.send_under_login_flood --base-url http://127.0.0.1:8000
+
+
+async def login_flood(client, usernames, deadline, statuses):
+    while time.perf_counter() < deadline:
+        # Her denemede farklı parola: negatif önbellek atlanır, özet hesaplanmak zorunda
+        username = usernames[sum(statuses.values()) % len(usernames)]
+        response = await client.post("/login", data={"username": username, "password": uuid.uuid4().hex})
+        statuses[response.status_code] += 1
+
+
+async def main(args):
+    password = "bench123"
+    image = make_stego_png(password, 64, 64)
+
+    limits = httpx.Limits(max_connections=args.senders + args.flooders + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+        sender_name = f"bench_{uuid.uuid4().hex[:12]}"
+        await register(client, sender_name, image)
+        token = await login(client, sender_name, password)
+        receiver_id = await register(client, f"bench_{uuid.uuid4().hex[:12]}", image)
+        usernames = [f"bench_{uuid.uuid4().hex[:12]}" for _ in range(args.flood_users)]
+        for username in usernames:
+            await register(client, username, image)
+
+        latencies, _ = await run_phase(client, token, receiver_id, password, args)
+        report("send only", latencies, 0)
+
+        statuses = Counter()
+        deadline = time.perf_counter() + args.duration
+        latencies, _ = (await asyncio.gather(
+            run_phase(client, token, receiver_id, password, args),
+            *(login_flood(client, usernames, deadline, statuses) for _ in range(args.flooders))
+        ))[0]
+        report("send + login flood", latencies, 0)
+        print(f"login responses: {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--senders", type=int, default=8)
+    parser.add_argument("--flooders", type=int, default=64)
+    parser.add_argument("--flood-users", type=int, default=20)
+    args = parser.parse_args()
+    args.registrations = 0
+    asyncio.run(main(args))
@@ -0,0 +1,123 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+import httpx
+import numpy as np
+from PIL import Image
+
+from services.crypto_service import des_encrypt
+from services.lsb_service import embed_password_in_image
+
+
+# Çalışan bir sunucuya karşı: /messages/send gecikmesi, eşzamanlı büyük resimli kayıtlar varken ve yokken.
+# Kullanım (server dizininden): python -m benchmarks.send_under_register_load --base-url http://127.0.0.1:8000
+
+
+def make_stego_png(password: str, width: int, height: int) -> bytes:
+    pixels = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    source = f"/tmp/bench_source_{os.getpid()}.png"
+    target = f"/tmp/bench_stego_{os.getpid()}.png"
+    Image.fromarray(pixels, 'RGB').save(source, 'PNG', compress_level=1)
+    embed_password_in_image(source, password, target)
+    with open(target, 'rb') as f:
+        data = f.read()
+    os.remove(source)
+    os.remove(target)
+    return data
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def register(client: httpx.AsyncClient, username: str, image_bytes: bytes) -> int:
+    response = await client.post(
+        "/register",
+        data={"username": username},
+        files={"image": ("stego.png", image_bytes, "image/png")}
+    )
+    response.raise_for_status()
+    return response.json()["user_id"]
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["token"]
+
+
+async def sender_loop(client, token, receiver_id, password, deadline, latencies):
+    content = des_encrypt("benchmark message", password)
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post("/messages/send", headers=headers, json={
+            "receiver_id": receiver_id,
+            "encrypted_content": content
+        })
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def register_loop(client, image_bytes, deadline, counter):
+    while time.perf_counter() < deadline:
+        await register(client, f"bench_{uuid.uuid4().hex[:12]}", image_bytes)
+        counter[0] += 1
+
+
+async def run_phase(client, token, receiver_id, password, args, big_image=None):
+    latencies = []
+    registrations = [0]
+    deadline = time.perf_counter() + args.duration
+    tasks = [
+        sender_loop(client, token, receiver_id, password, deadline, latencies)
+        for _ in range(args.senders)
+    ]
+    if big_image is not None:
+        tasks += [register_loop(client, big_image, deadline, registrations) for _ in range(args.registrations)]
+    await asyncio.gather(*tasks)
+    return latencies, registrations[0]
+
+
+def report(name, latencies, registrations):
+    print(
+        f"{name:<22} | sends={len(latencies):>6} | p50={statistics.median(latencies):>7.2f} ms | "
+        f"p99={percentile(latencies, 99):>7.2f} ms | registrations={registrations}"
+    )
+
+
+async def main(args):
+    width, height = (int(v) for v in args.image_size.split("x"))
+    password = "bench123"
+    small_image = make_stego_png(password, 64, 64)
+    big_image = make_stego_png(password, width, height)
+    print(f"Large upload: {width}x{height}, {len(big_image) / 1e6:.1f} MB")
+
+    limits = httpx.Limits(max_connections=args.senders + args.registrations + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+        sender_name = f"bench_{uuid.uuid4().hex[:12]}"
+        await register(client, sender_name, small_image)
+        token = await login(client, sender_name, password)
+        receiver_id = await register(client, f"bench_{uuid.uuid4().hex[:12]}", small_image)
+
+        latencies, _ = await run_phase(client, token, receiver_id, password, args)
+        report("send only", latencies, 0)
+
+        latencies, registrations = await run_phase(client, token, receiver_id, password, args, big_image)
+        report("send + registrations", latencies, registrations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--senders", type=int, default=8)
+    parser.add_argument("--registrations", type=int, default=4)
+    parser.add_argument("--image-size", default="3000x2000")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Optional
+
+from benchmarks import load, micro
+
+
+# Tekrarlanabilir ölçüm: mikro (DES, LSB) + uçtan uca yük; sonuçlar JSON olarak kaydedilir ve önceki bir
+# sonuçla (baseline) karşılaştırılır. Tolerans dışında kötüleşen metrik varsa çıkış kodu 1.
+# Kullanım (server dizininden):
+#   python -m benchmarks.suite --output baseline.json
+#   python -m benchmarks.suite --baseline baseline.json --tolerance 0.15
+
+
+def higher_is_better(name: str) -> bool:
+    return name.endswith("_per_s")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    # (metrik, önceki, şimdiki, değişim oranı, kötüleşme mi)
+    rows = []
+    for name, value in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = (value - before) / before
+        worse = -change if higher_is_better(name) else change
+        rows.append((name, before, value, change, worse > tolerance))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--micro", action="store_true", help="yalnızca mikro ölçümler")
+    parser.add_argument("--load", action="store_true", help="yalnızca uçtan uca yük")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=50, help="kullanıcı başına, WS ve HTTP için ayrı ayrı")
+    parser.add_argument("--history-pages", type=int, default=10)
+    parser.add_argument("--database-url", default=None, help="varsayılan: geçici SQLite")
+    parser.add_argument("--output", default=None, help="sonuçların yazılacağı JSON dosyası")
+    parser.add_argument("--baseline", default=None, help="karşılaştırılacak önceki JSON sonucu")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+    run_micro = args.micro or not args.load
+    run_load = args.load or not args.micro
+
+    results = {}
+    if run_micro:
+        results.update(micro.run())
+    if run_load:
+        results.update(load.run(args.users, args.messages, args.history_pages, args.database_url))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"users": args.users, "messages": args.messages, "history_pages": args.history_pages,
+                   "database": "sqlite" if args.database_url is None else args.database_url.split(":", 1)[0]},
+        "results": results
+    }
+
+    for name, value in results.items():
+        print(f"{name:<36} {value:>12.2f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("params") != report["params"]:
+        print(f"⚠️ Baseline parameters differ: {baseline.get('params')}")
+
+    rows = compare(results, baseline.get("results", {}), args.tolerance)
+    print(f"\nvs {baseline.get('commit') or args.baseline} (tolerance {args.tolerance:.0%})")
+    print(f"{'metric':<36} | {'baseline':>10} | {'current':>10} | {'change':>8}")
+    print("-" * 74)
+    for name, before, value, change, regressed in rows:
+        print(f"{name:<36} | {before:>10.2f} | {value:>10.2f} | {change:>+7.1%}{'  ❌' if regressed else ''}")
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import os
+import time
+
+
+# save_message_to_db verimi (mesaj/sn): her mesaj ayrı commit ve write-behind toplu yazım.
+# Kullanım (server dizininden): python -m benchmarks.write_behind_bench --messages 5000 --concurrency 64
+# Varsayılan olarak geçici bir SQLite dosyası kullanılır; PostgreSQL için --database-url verin (tablolara bench satırları eklenir).
+
+
+async def produce(session_factory, save, count: int, sender_id: int, receiver_id: int, offset: int):
+    # Her mesaj bir istek gibi kendi oturumunu açar
+    for i in range(count):
+        async with session_factory() as db:
+            await save(db, sender_id, receiver_id, f"bench-{offset + i}", is_delivered=False)
+
+
+async def run_mode(enabled: bool, messages: int, concurrency: int) -> float:
+    from database import AsyncSessionLocal, create_tables
+    from models import User
+    from services import message_handler
+    from services.write_behind import write_behind
+
+    await create_tables()
+    async with AsyncSessionLocal() as db:
+        sender = User(username=f"bench-sender-{time.time_ns()}", password="12345678")
+        receiver = User(username=f"bench-receiver-{time.time_ns()}", password="87654321")
+        db.add_all([sender, receiver])
+        await db.commit()
+        sender_id, receiver_id = sender.id, receiver.id
+
+    message_handler.WRITE_BEHIND_ENABLED = enabled
+    per_task = messages // concurrency
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        produce(AsyncSessionLocal, message_handler.save_message_to_db, per_task, sender_id, receiver_id, i * per_task)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    if enabled:
+        await write_behind.close()
+    return per_task * concurrency / elapsed
+
+
+async def run(messages: int, concurrency: int):
+    from database import engine
+    from services.write_behind import write_behind
+
+    print(f"messages={messages} concurrency={concurrency} database={engine.url.render_as_string(hide_password=True)}")
+    print(f"{'write-behind':>12} | {'msg/s':>10}")
+    print("-" * 26)
+    results = []
+    for enabled in (False, True):
+        rate = await run_mode(enabled, messages, concurrency)
+        results.append(rate)
+        print(f"{'on' if enabled else 'off':>12} | {rate:>10.0f}")
+    print(f"speedup: {results[1] / results[0]:.1f}x ({write_behind.batches} batches, "
+          f"{write_behind.rows / max(write_behind.batches, 1):.1f} rows/batch)")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    # database modülü içe aktarılmadan önce ayarlanmalı
+    database_url = args.database_url or f"sqlite:////tmp/write_behind_bench_{os.getpid()}.db"
+    os.environ["DATABASE_URL"] = database_url
+    try:
+        asyncio.run(run(args.messages, args.concurrency))
+    finally:
+        if args.database_url is None and os.path.exists(database_url[len("sqlite:///"):]):
+            os.remove(database_url[len("sqlite:///"):])
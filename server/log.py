@@ -0,0 +1,114 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from config import LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE_RATE
+
+
+ROOT_LOGGER = "securechat"
+
+# LogRecord'un kendi alanları; geri kalanlar extra={...} ile gelen yapısal alanlardır
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = " ".join(f"{k}={v}" for k, v in record.__dict__.items() if k not in _RECORD_FIELDS)
+        return f"{text} {fields}" if fields else text
+
+
+class DropQueueHandler(QueueHandler):
+    # Kuyruk doluysa kayıt atılır; istek yolu stdout yazımını asla beklemez
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Mesaj ve traceback biçimlendirmesi dinleyici thread'inde yapılır; olay döngüsü yalnızca kaydı kuyruğa ekler.
+        # Süreçler arası kuyruk olmadığı için kayıt (args, exc_info) olduğu gibi taşınabilir
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> logging.Logger:
+    # stdout'a yazım ayrı bir thread'de (QueueListener); çağıran yalnızca kuyruğa ekler
+    global _listener
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level.upper())
+    if _listener is not None:
+        return logger
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    logger.handlers = [DropQueueHandler(log_queue)]
+    logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return logger
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+class SampledLogger:
+    # Mesaj başına olaylar için: seviye kapalıysa veya örneklemde değilse kayıt hiç oluşturulmaz
+
+    def __init__(self, logger: logging.Logger, rate: float = LOG_SAMPLE_RATE):
+        self.logger = logger
+        self.rate = rate
+
+    def _keep(self, level: int) -> bool:
+        if not self.logger.isEnabledFor(level):
+            return False
+        return self.rate >= 1 or random.random() < self.rate
+
+    def debug(self, msg: str, *args, **kwargs):
+        if self._keep(logging.DEBUG):
+            self.logger.debug(msg, *args, stacklevel=2, **kwargs)
+
+    def info(self, msg: str, *args, **kwargs):
+        if self._keep(logging.INFO):
+            self.logger.info(msg, *args, stacklevel=2, **kwargs)
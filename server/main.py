@@ -1,123 +1,189 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import ValidationError
+from sqlalchemy import func, select, tuple_, update
+from starlette.requests import ClientDisconnect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from contextlib import asynccontextmanager
-from typing import Dict, List, Optional
+from typing import List, Optional
+import asyncio
+import hashlib
 import json
 
-from database import SessionLocal, create_tables
+from config import ATTACHMENT_CHUNK_MAX_BYTES, ATTACHMENT_MAX_BYTES
+from database import AsyncSessionLocal, create_tables, engine, get_db
+from log import SampledLogger, get_logger, setup_logging, stop_logging
 from models import User, Message
-from schemas import UserCreate, MessageCreate
+from schemas import AttachmentCreate, UserCreate, MessageCreate
 
+from services.attachments import RECEIVER, SENDER, UploadInProgress, UploadTooLarge, attachment_store
+from services.blob_store import blob_store
+from services.crypto_service import StreamError, transcode_batch
 from services.lsb_service import extract_password_from_image
+from services.thumbnail_service import (
+    THUMBNAIL_FORMATS,
+    THUMBNAIL_SIZES,
+    schedule_thumbnails,
+    thumbnail_cache
+)
+from services.connection_manager import manager
+from services.offline_queue import PendingFlush
+from services.presence import presence
+from services.password_hasher import LoginRejected, login_guard
+from services.router import router
+from services.session_tokens import InvalidToken, SessionClaims, session_tokens
+from services.write_behind import write_behind
+from services.executors import run_cpu, run_io, shutdown_executors
+from services.metrics import CONTENT_TYPE, SEND_STAGE_SECONDS, Gauge, MetricsMiddleware, registry
 from services.message_handler import (
+    create_attachment,
+    get_attachment,
+    update_attachment,
     process_message,
     save_message_to_db,
-    get_user_password
+    get_user_password,
+    get_user_by_username,
+    get_message_by_client_id,
+    mark_messages_read,
+    create_user,
+    set_password_hash,
+    set_user_online,
+    user_cache
 )
 
 
-class ConnectionManager:
-    
-    def __init__(self):
-        self.active_connections: Dict[int, List[WebSocket]] = {}
-    
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
-        if user_id not in self.active_connections:
-            self.active_connections[user_id] = []
-        self.active_connections[user_id].append(websocket)
-        print(f"✅ WebSocket connected: user_id={user_id}, total connections={len(self.active_connections[user_id])}")
-    
-    def disconnect(self, websocket: WebSocket, user_id: int):
-        if user_id in self.active_connections:
-            if websocket in self.active_connections[user_id]:
-                self.active_connections[user_id].remove(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-        print(f"❌ WebSocket disconnected: user_id={user_id}")
-    
-    async def send_personal_message(self, message: dict, user_id: int):
-        if user_id in self.active_connections:
-            disconnected = []
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_json(message)
-                except Exception as e:
-                    print(f"Error sending to user {user_id}: {e}")
-                    disconnected.append(connection)
-            
-            for conn in disconnected:
-                self.disconnect(conn, user_id)
-    
-    async def broadcast_status(self, user_id: int, username: str, is_online: bool):
-        message = {
-            "type": "status",
-            "user_id": user_id,
-            "username": username,
-            "is_online": is_online
-        }
-        
-        for uid in list(self.active_connections.keys()):
-            await self.send_personal_message(message, uid)
+setup_logging()
+logger = get_logger("main")
+# Mesaj başına olaylar örneklenir (LOG_SAMPLE_RATE)
+message_log = SampledLogger(logger)
 
-manager = ConnectionManager()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_tables()
+    await create_tables()
+    await router.start()
     yield
+    await router.stop()
+    await manager.close_all()
+    await write_behind.close()
+    shutdown_executors()
+    stop_logging()
 
 app = FastAPI(lifespan=lifespan)
-
-def get_db():
-    db = SessionLocal()
+app.add_middleware(MetricsMiddleware)
+
+
+def db_pool_usage():
+    # NullPool (SQLite) bağlantı tutmaz; yalnızca kuyruklu havuzlar ölçülür
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, "checkedout"):
+        return None
+    return {("checked_out",): pool.checkedout(), ("size",): pool.size(), ("overflow",): max(pool.overflow(), 0)}
+
+
+registry.register(Gauge("securechat_websocket_connections", "Open WebSocket connections on this worker",
+                        manager.connection_count))
+registry.register(Gauge("securechat_websocket_users", "Users with at least one WebSocket on this worker",
+                        lambda: len(manager.active_connections)))
+registry.register(Gauge("securechat_websocket_send_queue_depth", "Frames waiting in WebSocket send queues",
+                        manager.queue_depth))
+registry.register(Gauge("securechat_websocket_dropped_total", "Slow WebSocket consumers disconnected",
+                        lambda: manager.dropped, kind="counter"))
+registry.register(Gauge("securechat_write_behind_pending", "Rows waiting in the write-behind buffer",
+                        write_behind.pending))
+registry.register(Gauge("securechat_db_pool_connections", "Database pool connections",
+                        db_pool_usage, ("state",)))
+registry.register(Gauge("securechat_user_cache_entries", "Users in the in-process cache",
+                        lambda: user_cache.stats()["size"]))
+registry.register(Gauge("securechat_user_cache_requests_total", "User cache lookups",
+                        lambda: {("hit",): user_cache.hits, ("miss",): user_cache.misses}, ("result",), kind="counter"))
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def current_session(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> SessionClaims:
+    # Yalnızca imza ve süre kontrolü; veritabanına gidilmez
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
     try:
-        yield db
-    finally:
-        db.close()
+        return session_tokens.verify(credentials.credentials)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+def require_user(session: SessionClaims, user_id: Optional[int]) -> int:
+    # İstek gövdesi/yolundaki kimlik jetondaki kullanıcıdan farklı olamaz
+    if user_id is not None and user_id != session.user_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return session.user_id
+
+
+async def with_session(func, *args, **kwargs):
+    # İstek bağımlılığı olmayan yerler (WebSocket) için kısa ömürlü oturum
+    async with AsyncSessionLocal() as db:
+        return await func(db, *args, **kwargs)
 
 
 @app.get("/")
 def root():
     return {"message": "Server çalışıyor"}
 
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+async def auth_call(awaitable):
+    # Kimlik doğrulama havuzu dolu (503) ya da kullanıcı adı kısıtlı (429)
+    try:
+        return await awaitable
+    except LoginRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+
 @app.post("/register")
 async def register_user(
     username: str = Form(...),
     image: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    if db.query(User).filter(User.username == username).first():
+    if await get_user_by_username(db, username):
         raise HTTPException(status_code=400, detail="Username exists")
 
     image_bytes = await image.read()
     
     try:
-        extracted_password = extract_password_from_image(image_bytes)
-        print(f"✅ Register: Extracted password '{extracted_password}' from image for user '{username}'")
+        # Resim çözme süreç havuzunda; büyük yüklemeler olay döngüsünü durdurmaz
+        extracted_password = await run_cpu(extract_password_from_image, image_bytes)
         
         if not extracted_password or extracted_password.strip('\x00') == '':
             raise ValueError("Extracted password is empty or invalid")
             
     except Exception as e:
-        print(f"❌ Register: Failed to extract password: {e}")
+        logger.warning("Register: failed to extract password for %s: %s", username, type(e).__name__)
         raise HTTPException(
             status_code=400,
             detail="Resimden şifre çıkarılamadı. Lütfen geçerli bir steganografik resim kullanın. Register ekranında resim seçtikten sonra şifrenizi girin ve kayıt olun."
         )
 
-    new_user = User(
-        username=username,
-        stego_image=image_bytes,
-        password=extracted_password,  
-        is_online=False 
-    )
-
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    password_hash = await auth_call(login_guard.hash(extracted_password))
+    stego_digest = await run_io(blob_store.put, image_bytes)
+    
+    try:
+        new_user = await create_user(db, username, stego_digest, extracted_password, password_hash)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Username exists")
+    
+    # Kayıttan önce bu adla yapılmış başarısız girişler önbellekte kalmasın
+    login_guard.forget(username)
+    schedule_thumbnails(stego_digest)
 
-    print(f"✅ Register successful: user_id={new_user.id}, username={new_user.username}")
+    logger.info("Register successful: user_id=%s username=%s", new_user.id, new_user.username)
     return {"message": "Kayıt başarılı", "user_id": new_user.id}
 
 
@@ -125,218 +191,743 @@ async def register_user(
 async def login(
     username: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
+    # Kısıtlanan ve yakın zamanda reddedilen denemeler veritabanına gitmeden yanıtlanır
+    try:
+        admitted = login_guard.admit(username, password)
+    except LoginRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
     
-    db_user = db.query(User).filter(User.username == username).first()
+    db_user = await get_user_by_username(db, username) if admitted else None
 
     if not db_user:
+        if admitted:
+            login_guard.reject(username, password)
         raise HTTPException(
             status_code=401,
             detail="Hatalı kullanıcı adı veya şifre"
         )
     
-    if db_user.password != password:
+    # scrypt doğrulaması ayrı süreç havuzunda; yoğun giriş yükü yalnızca /login'i yavaşlatır
+    if not await auth_call(login_guard.verify(username, password, db_user.password_hash, db_user.password)):
         raise HTTPException(
             status_code=401,
             detail="Hatalı kullanıcı adı veya şifre"
         )
+    
+    if not db_user.password_hash:
+        try:
+            await set_password_hash(db, db_user.id, await login_guard.hash(password))
+        except LoginRejected:
+            pass
+
+    await set_user_online(db, db_user.id, True)
+
+    logger.info("Login successful: user_id=%s username=%s", db_user.id, db_user.username)
+    return {
+        "message": "Giriş başarılı",
+        "user_id": db_user.id,
+        "key_version": db_user.key_version,
+        "token": session_tokens.issue(db_user.id, db_user.key_version)
+    }
 
-    db_user.is_online = True
-    db.commit()
 
-    print(f"✅ Login successful: user_id={db_user.id}, username={db_user.username}")
-    return {"message": "Giriş başarılı", "user_id": db_user.id}
+USERS_MAX_PAGE_SIZE = 500
 
 
 @app.get("/users")
-def get_users(current_user_id: Optional[int] = None, db: Session = Depends(get_db)):
-    users = db.query(User).all()
+async def get_users(
+    request: Request,
+    current_user_id: Optional[int] = None,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=USERS_MAX_PAGE_SIZE),
+    session: SessionClaims = Depends(current_session),
+    db: AsyncSession = Depends(get_db)
+):
+    require_user(session, current_user_id)
+    if current_user_id is not None:
+        # Okunmamış sayıları tek bir GROUP BY sorgusuyla hesaplanır ve kullanıcılara eklenir
+        unread = select(
+            Message.sender_id.label("sender_id"),
+            func.count(Message.id).label("unread_count")
+        ).where(
+            Message.receiver_id == current_user_id,
+            Message.is_read == False
+        ).group_by(Message.sender_id).subquery()
+        
+        query = select(
+            User.id,
+            User.username,
+            User.is_online,
+            func.coalesce(unread.c.unread_count, 0).label("unread_count")
+        ).outerjoin(unread, unread.c.sender_id == User.id)
+    else:
+        query = select(User.id, User.username, User.is_online)
+    
+    query = query.order_by(User.id).offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    
     result = []
-    for u in users:
+    for row in (await db.execute(query)).all():
         user_data = {
-            "id": u.id, 
-            "username": u.username, 
-            "is_online": u.is_online
+            "id": row.id, 
+            "username": row.username, 
+            "is_online": row.is_online
         }
-        
         if current_user_id is not None:
-             unread = db.query(Message).filter(
-                Message.sender_id == u.id,
-                Message.receiver_id == current_user_id,
-                Message.is_read == False
-            ).count()
-             user_data["unread_count"] = unread
-             
+            user_data["unread_count"] = row.unread_count
         result.append(user_data)
-        
-    return result
+    
+    # Liste değişmediyse istemci 304 alır, gövde tekrar gönderilmez
+    body = json.dumps(result, separators=(",", ":")).encode("utf-8")
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
 
+PHOTO_CACHE_CONTROL = "public, max-age=86400"
 
-from fastapi.responses import Response
 
 @app.get("/users/{user_id}/photo")
-def get_user_photo(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user or not user.stego_image:
+async def get_user_photo(
+    user_id: int,
+    request: Request,
+    size: Optional[str] = Query(None, pattern="^(" + "|".join(THUMBNAIL_SIZES) + ")$"),
+    format: str = Query("webp", pattern="^(" + "|".join(THUMBNAIL_FORMATS) + ")$"),
+    db: AsyncSession = Depends(get_db)
+):
+    user = (await db.execute(select(User.stego_digest).where(User.id == user_id))).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    
+    if user.stego_digest and await run_io(blob_store.exists, user.stego_digest):
+        # İçerik adresli olduğu için özet doğrudan ETag olarak kullanılır
+        etag = f'"{user.stego_digest}-{size}.{format}"' if size else f'"{user.stego_digest}"'
+        headers = {"ETag": etag, "Cache-Control": PHOTO_CACHE_CONTROL}
+        if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+        
+        if size:
+            # LRU dokunuşu (utime) de diske gider, olay döngüsünde yapılmaz
+            path = await run_io(thumbnail_cache.get, user.stego_digest, size, format)
+            if path is None:
+                await thumbnail_cache.generate(user.stego_digest)
+                path = thumbnail_cache.path_for(user.stego_digest, size, format)
+            return FileResponse(path, media_type=THUMBNAIL_FORMATS[format][1], headers=headers)
+        
+        return FileResponse(
+            blob_store.path_for(user.stego_digest),
+            media_type=await run_io(blob_store.media_type, user.stego_digest),
+            headers=headers
+        )
+    
+    # Henüz taşınmamış eski kayıt
+    legacy_image = (await db.execute(select(User.stego_image).where(User.id == user_id))).scalar()
+    if not legacy_image:
         raise HTTPException(status_code=404, detail="Photo not found")
     
     return Response(
-        content=user.stego_image,
+        content=legacy_image,
         media_type="image/png"
     )
 
 
-@app.post("/messages/send")
-async def send_message(msg: MessageCreate, db: Session = Depends(get_db)):
-    
-    sender = db.query(User).filter(User.id == msg.sender_id).first()
-    receiver = db.query(User).filter(User.id == msg.receiver_id).first()
+# Bundan büyük mesajların DES çevirisi thread havuzunda yapılır; küçüklerde thread geçişi çeviriden pahalı
+INLINE_CRYPTO_MAX_CHARS = 4096
+
+
+async def store_message(db: AsyncSession, msg: MessageCreate, receiver_connected: bool, key_version: int):
+    with SEND_STAGE_SECONDS.time("user_lookup"):
+        sender = await user_cache.get(db, msg.sender_id)
+        receiver = await user_cache.get(db, msg.receiver_id)
     
     if not sender or not receiver:
         raise HTTPException(status_code=404, detail="User not found")
     
-    sender_password = get_user_password(db, msg.sender_id)
-    receiver_password = get_user_password(db, msg.receiver_id)
+    # Anahtarı değişmiş kullanıcının eski oturumu
+    if sender.key_version != key_version:
+        raise HTTPException(status_code=401, detail="Session key version is stale", headers={"WWW-Authenticate": "Bearer"})
+    
+    sender_password = sender.password
+    receiver_password = receiver.password
     
     if not sender_password or not receiver_password:
         raise HTTPException(status_code=500, detail="Password retrieval failed")
     
-    print(f"\n📨 ===== MESAJ GÖNDERİLİYOR =====")
-    print(f"   Gönderen: {sender.username} (ID: {msg.sender_id})")
-    print(f"   Alıcı: {receiver.username} (ID: {msg.receiver_id})")
-    print(f"   🔐 Şifrelenmiş Mesaj (Gönderenden): {msg.encrypted_content[:50]}..." if len(msg.encrypted_content) > 50 else f"   🔐 Şifrelenmiş Mesaj (Gönderenden): {msg.encrypted_content}")
+    if msg.attachment_id is not None:
+        # Ek aynı gönderen/alıcı çiftine ait ve alıcı kopyası hazır olmalı
+        attachment = await get_attachment(db, msg.attachment_id)
+        if not attachment or attachment.sender_id != msg.sender_id or attachment.receiver_id != msg.receiver_id:
+            raise HTTPException(status_code=404, detail="Attachment not found")
+        if not attachment.is_complete:
+            raise HTTPException(status_code=409, detail="Attachment upload is not complete")
     
     try:
-        encrypted_for_receiver = process_message(
-            msg.encrypted_content,
-            sender_password,
-            receiver_password
-        )
-        print(f"   🔐 Şifrelenmiş Mesaj (Alıcı için): {encrypted_for_receiver[:50]}..." if len(encrypted_for_receiver) > 50 else f"   🔐 Şifrelenmiş Mesaj (Alıcı için): {encrypted_for_receiver}")
+        if len(msg.encrypted_content) > INLINE_CRYPTO_MAX_CHARS:
+            encrypted_for_receiver = await run_io(
+                process_message,
+                msg.encrypted_content,
+                sender_password,
+                receiver_password
+            )
+        else:
+            encrypted_for_receiver = process_message(
+                msg.encrypted_content,
+                sender_password,
+                receiver_password
+            )
     except Exception as e:
-        print(f"   ❌ Mesaj işleme hatası: {e}")
+        logger.warning("Message processing failed: %s -> %s: %s", msg.sender_id, msg.receiver_id, type(e).__name__)
         raise HTTPException(status_code=500, detail=f"Message processing failed: {str(e)}")
     
-    is_receiver_online = receiver.is_online and msg.receiver_id in manager.active_connections
+    is_receiver_online = receiver_connected
+    
+    with SEND_STAGE_SECONDS.time("db_insert"):
+        db_message = await save_message_to_db(
+            db,
+            msg.sender_id,
+            msg.receiver_id,
+            encrypted_for_receiver,
+            is_delivered=is_receiver_online,
+            sender_encrypted_content=msg.encrypted_content,
+            client_message_id=msg.client_message_id,
+            attachment_id=msg.attachment_id
+        )
     
-    db_message = save_message_to_db(
-        db,
-        msg.sender_id,
-        msg.receiver_id,
-        encrypted_for_receiver,
-        is_delivered=is_receiver_online
+    # İçerik ve şifreler loglanmaz; yalnızca kimlikler ve uzunluk
+    message_log.debug(
+        "Message stored: id=%s %s -> %s len=%s status=%s",
+        db_message.id, msg.sender_id, msg.receiver_id, len(msg.encrypted_content),
+        "delivered" if is_receiver_online else "sent"
     )
     
+    return db_message, encrypted_for_receiver, is_receiver_online
+
+
+def message_ack(db_message, duplicate: bool = False) -> dict:
+    return {
+        "message_id": db_message.id,
+        "status": db_message.status,
+        "created_at": db_message.created_at.isoformat() if db_message.created_at else None,
+        "duplicate": duplicate
+    }
+
+
+async def deliver_message(db: AsyncSession, msg: MessageCreate, session: SessionClaims) -> dict:
+    # HTTP ve WebSocket "send" ortak yolu: kaydet, alıcıya ve gönderenin cihazlarına ilet
+    if msg.client_message_id:
+        existing = await get_message_by_client_id(db, msg.sender_id, msg.client_message_id)
+        if existing:
+            return message_ack(existing, duplicate=True)
+    
+    # Alıcı herhangi bir worker'a bağlı mı
+    receiver_connected = router.is_online(msg.receiver_id)
+    try:
+        db_message, encrypted_for_receiver, is_receiver_online = await store_message(
+            db, msg, receiver_connected, session.key_version
+        )
+    except IntegrityError:
+        # Aynı istemci kimliği eşzamanlı geldi (ör. WebSocket + HTTP tekrar denemesi): ilk kayıt geçerli
+        await db.rollback()
+        existing = None
+        if msg.client_message_id:
+            existing = await get_message_by_client_id(db, msg.sender_id, msg.client_message_id)
+        if existing is None:
+            raise
+        return message_ack(existing, duplicate=True)
+    
     message_status = "delivered" if is_receiver_online else "sent"
-    print(f"   📤 Durum: {message_status}")
-    print(f"   ================================\n")
     
-    if is_receiver_online:
-        await manager.send_personal_message(
+    with SEND_STAGE_SECONDS.time("fanout"):
+        if is_receiver_online:
+            await router.deliver(
+                {
+                    "type": "message",
+                    "message_id": db_message.id,
+                    "sender_id": msg.sender_id,
+                    "receiver_id": msg.receiver_id,
+                    "encrypted_content": encrypted_for_receiver,
+                    "attachment_id": msg.attachment_id,
+                    "status": message_status,
+                    "created_at": db_message.created_at.isoformat()
+                },
+                msg.receiver_id
+            )
+    
+        await router.deliver(
             {
                 "type": "message",
                 "message_id": db_message.id,
                 "sender_id": msg.sender_id,
                 "receiver_id": msg.receiver_id,
-                "encrypted_content": encrypted_for_receiver,
+                "encrypted_content": msg.encrypted_content,
+                "attachment_id": msg.attachment_id,
                 "status": message_status,
                 "created_at": db_message.created_at.isoformat()
             },
-            msg.receiver_id
+            msg.sender_id
         )
     
-    await manager.send_personal_message(
-        {
-            "type": "message",
-            "message_id": db_message.id,
-            "sender_id": msg.sender_id,
-            "receiver_id": msg.receiver_id,
-            "encrypted_content": msg.encrypted_content,
-            "status": message_status,
-            "created_at": db_message.created_at.isoformat()
-        },
-        msg.sender_id
-    )
-    
-    return {"message": "Mesaj gönderildi", "message_id": db_message.id, "status": message_status}
+    return message_ack(db_message)
 
 
-@app.get("/messages/{me_id}/{other_id}")
-def get_messages(me_id: int, other_id: int, db: Session = Depends(get_db)):
-    
-    messages = db.query(Message).filter(
+@app.post("/messages/send")
+async def send_message(
+    msg: MessageCreate,
+    session: SessionClaims = Depends(current_session),
+    db: AsyncSession = Depends(get_db)
+):
+    msg.sender_id = require_user(session, msg.sender_id)
+    ack = await deliver_message(db, msg, session)
+    return {"message": "Mesaj gönderildi", **ack}
+
+
+HISTORY_MAX_PAGE_SIZE = 500
+HISTORY_STREAM_BATCH_SIZE = 500
+
+
+def conversation_filter(me_id: int, other_id: int):
+    return (
         ((Message.sender_id == me_id) & (Message.receiver_id == other_id)) |
         ((Message.sender_id == other_id) & (Message.receiver_id == me_id))
-    ).order_by(Message.created_at).all()
-    
-    # Kullanıcı şifrelerini al
-    my_password = get_user_password(db, me_id)
-    other_password = get_user_password(db, other_id)
+    )
+
+
+async def serialize_history(db: AsyncSession, messages, me_id: int, other_id: int, passwords: dict) -> List[dict]:
+    # Eski mesajlarda gönderen kopyası yok; bunlar tek seferde benim anahtarıma çevrilir
+    sent_by_me = [m for m in messages if m.sender_id == me_id and m.sender_encrypted_content is None]
+    transcoded = {}
+    if sent_by_me:
+        # Kullanıcı şifrelerini yalnızca eski mesajlar varsa al
+        if not passwords:
+            passwords["me"] = await get_user_password(db, me_id)
+            passwords["other"] = await get_user_password(db, other_id)
+        my_password = passwords["me"]
+        other_password = passwords["other"]
+        
+        if my_password and other_password:
+            cipher_texts = [m.encrypted_content for m in sent_by_me]
+            # Büyük sayfalar thread havuzunda çevrilir; olay döngüsü diğer bağlantılara hizmet etmeye devam eder
+            if sum(len(c) for c in cipher_texts) > INLINE_CRYPTO_MAX_CHARS:
+                batch = await run_io(transcode_batch, cipher_texts, other_password, my_password)
+            else:
+                batch = transcode_batch(cipher_texts, other_password, my_password)
+            for m, encrypted_for_me in zip(sent_by_me, batch):
+                if encrypted_for_me is None:
+                    logger.warning("Re-encryption failed for message %s", m.id)
+                else:
+                    transcoded[m.id] = encrypted_for_me
     
     result = []
-    messages_to_mark_read = []
-    
     for m in messages:
-        encrypted_for_me = m.encrypted_content
-        
-
-        if m.sender_id == me_id:
-            try:
-                from services.crypto_service import des_decrypt, des_encrypt
-                plain = des_decrypt(m.encrypted_content, other_password)
-                encrypted_for_me = des_encrypt(plain, my_password)
-            except Exception as e:
-                print(f"⚠️ Re-encryption failed for message {m.id}: {e}")
+        if m.sender_id == me_id and m.sender_encrypted_content is not None:
+            encrypted_for_me = m.sender_encrypted_content
         else:
-            if not m.is_read:
-                messages_to_mark_read.append(m.id)
+            encrypted_for_me = transcoded.get(m.id, m.encrypted_content)
         
         result.append({
             "message_id": m.id,
             "sender_id": m.sender_id,
             "receiver_id": m.receiver_id,
             "encrypted_content": encrypted_for_me,
+            "attachment_id": m.attachment_id,
             "status": m.status,
             "created_at": m.created_at
         })
+    return result
+
+
+async def stream_history(me_id: int, other_id: int, cursor_filter):
+    # Sunucu tarafı cursor ile satırlar parça parça okunur; bellek kullanımı sohbet uzunluğundan bağımsız
+    async with AsyncSessionLocal() as db:
+        query = select(Message).where(conversation_filter(me_id, other_id))
+        if cursor_filter is not None:
+            query = query.where(cursor_filter)
+        query = query.order_by(Message.created_at, Message.id).execution_options(
+            yield_per=HISTORY_STREAM_BATCH_SIZE
+        )
+        
+        passwords = {}
+        last_id = None
+        result = await db.stream(query)
+        async for partition in result.scalars().partitions():
+            for item in await serialize_history(db, partition, me_id, other_id, passwords):
+                item["created_at"] = item["created_at"].isoformat() if item["created_at"] else None
+                yield json.dumps(item) + "\n"
+            last_id = partition[-1].id
+        await result.close()
+        
+        if last_id is not None:
+            await db.execute(
+                update(Message).where(
+                    Message.sender_id == other_id,
+                    Message.receiver_id == me_id,
+                    Message.is_read == False,
+                    Message.id <= last_id
+                ).values(is_read=True, is_delivered=True)
+            )
+            await db.commit()
+
+
+@app.get("/messages/{me_id}/{other_id}")
+async def get_messages(
+    me_id: int,
+    other_id: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    stream: bool = False,
+    session: SessionClaims = Depends(current_session),
+    db: AsyncSession = Depends(get_db)
+):
+    require_user(session, me_id)
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="before_id and after_id cannot be used together")
     
-    if messages_to_mark_read:
-        db.query(Message).filter(Message.id.in_(messages_to_mark_read)).update(
-            {"is_read": True, "is_delivered": True},
-            synchronize_session=False
+    # Keyset sayfalama: imleç mesajın (created_at, id) değerinden devam edilir
+    cursor_filter = None
+    cursor_id = before_id if before_id is not None else after_id
+    if cursor_id is not None:
+        cursor_exists = (await db.execute(
+            select(Message.id).where(
+                Message.id == cursor_id,
+                conversation_filter(me_id, other_id)
+            )
+        )).first()
+        if not cursor_exists:
+            raise HTTPException(status_code=404, detail="Cursor message not found")
+        
+        cursor_created_at = select(Message.created_at).where(Message.id == cursor_id).scalar_subquery()
+        position = tuple_(Message.created_at, Message.id)
+        cursor = tuple_(cursor_created_at, cursor_id)
+        cursor_filter = position < cursor if before_id is not None else position > cursor
+    
+    if stream:
+        return StreamingResponse(
+            stream_history(me_id, other_id, cursor_filter),
+            media_type="application/x-ndjson"
         )
-        db.commit()
+    
+    query = select(Message).where(conversation_filter(me_id, other_id))
+    if cursor_filter is not None:
+        query = query.where(cursor_filter)
+    
+    if before_id is not None and limit is not None:
+        # Sayfa imlecin hemen öncesinden alınır, sonra kronolojik sıraya çevrilir
+        query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+        messages = list((await db.execute(query)).scalars().all())
+        messages.reverse()
+    else:
+        query = query.order_by(Message.created_at, Message.id)
+        if limit is not None:
+            query = query.limit(limit)
+        messages = (await db.execute(query)).scalars().all()
+    
+    result = await serialize_history(db, messages, me_id, other_id, {})
+    
+    messages_to_mark_read = [m.id for m in messages if m.sender_id != me_id and not m.is_read]
+    if messages_to_mark_read:
+        await mark_messages_read(db, messages_to_mark_read)
     
     return result
 
 
+def attachment_info(attachment) -> dict:
+    return {
+        "attachment_id": attachment.id,
+        "sender_id": attachment.sender_id,
+        "receiver_id": attachment.receiver_id,
+        "file_name": attachment.file_name,
+        "media_type": attachment.media_type,
+        "size": attachment.size,
+        "received_size": attachment.received_size,
+        "complete": attachment.is_complete
+    }
+
+
+async def load_attachment(db: AsyncSession, attachment_id: int, session: SessionClaims):
+    # Yalnızca gönderen ve alıcı görebilir; diğerlerine varlığı da gösterilmez
+    attachment = await get_attachment(db, attachment_id)
+    if not attachment or session.user_id not in (attachment.sender_id, attachment.receiver_id):
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return attachment
+
+
+async def request_body(request: Request):
+    # İstemci koparsa o ana kadar gelen kısım kaydedilir; yükleme oradan devam eder
+    try:
+        async for chunk in request.stream():
+            yield chunk
+    except ClientDisconnect:
+        return
+
+
+@app.post("/attachments")
+async def create_attachment_upload(
+    body: AttachmentCreate,
+    session: SessionClaims = Depends(current_session),
+    db: AsyncSession = Depends(get_db)
+):
+    # İçerik istemcide gönderenin anahtarıyla akış biçiminde (aead) şifrelenir ve parça parça yüklenir
+    if body.size > ATTACHMENT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Attachment is too large")
+    if not await user_cache.get(db, body.receiver_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    attachment = await create_attachment(
+        db, session.user_id, body.receiver_id, body.file_name, body.media_type, body.size
+    )
+    return {**attachment_info(attachment), "chunk_max_bytes": ATTACHMENT_CHUNK_MAX_BYTES}
+
+
+@app.get("/attachments/{attachment_id}")
+async def get_attachment_info(
+    attachment_id: int,
+    session: SessionClaims = Depends(current_session),
+    db: AsyncSession = Depends(get_db)
+):
+    # Yarıda kalan yükleme received_size'dan devam eder
+    return attachment_info(await load_attachment(db, attachment_id, session))
+
+
+@app.put("/attachments/{attachment_id}/content")
+async def upload_attachment_chunk(
+    attachment_id: int,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    session: SessionClaims = Depends(current_session),
+    db: AsyncSession = Depends(get_db)
+):
+    attachment = await load_attachment(db, attachment_id, session)
+    if attachment.sender_id != session.user_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if attachment.is_complete:
+        raise HTTPException(status_code=409, detail="Attachment upload is already complete")
+    # Parçalar sırayla gelmeli; istemci kayıtlı konumu öğrenip oradan devam eder
+    if offset != attachment.received_size:
+        raise HTTPException(
+            status_code=409,
+            detail="Upload offset mismatch",
+            headers={"Upload-Offset": str(attachment.received_size)}
+        )
+    
+    limit = min(ATTACHMENT_CHUNK_MAX_BYTES, attachment.size - offset)
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(status_code=413, detail="Upload exceeds the declared attachment size")
+    
+    try:
+        async with attachment_store.upload(attachment.id) as upload:
+            # Kilit alınana kadar başka bir worker yazmış olabilir: kayıtlı konum işlem kapatılıp yeniden okunur
+            await db.rollback()
+            await db.refresh(attachment)
+            if attachment.is_complete or offset != attachment.received_size:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Upload offset mismatch",
+                    headers={"Upload-Offset": str(attachment.received_size)}
+                )
+            written = await upload.write(offset, request_body(request), limit)
+            received_size = offset + written
+            await update_attachment(db, attachment.id, received_size=received_size)
+    except UploadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    return {"attachment_id": attachment.id, "received_size": received_size, "size": attachment.size}
+
+
+@app.post("/attachments/{attachment_id}/complete")
+async def complete_attachment_upload(
+    attachment_id: int,
+    session: SessionClaims = Depends(current_session),
+    db: AsyncSession = Depends(get_db)
+):
+    attachment = await load_attachment(db, attachment_id, session)
+    if attachment.sender_id != session.user_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if attachment.is_complete:
+        return attachment_info(attachment)
+    if attachment.received_size != attachment.size:
+        raise HTTPException(
+            status_code=409,
+            detail="Attachment upload is not complete",
+            headers={"Upload-Offset": str(attachment.received_size)}
+        )
+    
+    sender_password = await get_user_password(db, attachment.sender_id)
+    receiver_password = await get_user_password(db, attachment.receiver_id)
+    if not sender_password or not receiver_password:
+        raise HTTPException(status_code=500, detail="Password retrieval failed")
+    
+    # Alıcı kopyası akış halinde üretilir: bellekte dosya boyutundan bağımsız olarak birkaç parça
+    try:
+        await run_io(attachment_store.transcode, attachment.id, sender_password, receiver_password)
+    except StreamError as e:
+        # Bozuk ya da başka anahtarla şifrelenmiş içerik: yükleme baştan yapılmalı
+        logger.warning("Attachment %s re-encryption failed: %s", attachment.id, e)
+        await run_io(attachment_store.delete, attachment.id)
+        await update_attachment(db, attachment.id, received_size=0)
+        raise HTTPException(status_code=400, detail="Attachment content could not be decrypted")
+    
+    await update_attachment(db, attachment.id, is_complete=True)
+    attachment.is_complete = True
+    return attachment_info(attachment)
+
+
+@app.get("/attachments/{attachment_id}/content")
+async def download_attachment(
+    attachment_id: int,
+    session: SessionClaims = Depends(current_session),
+    db: AsyncSession = Depends(get_db)
+):
+    attachment = await load_attachment(db, attachment_id, session)
+    if not attachment.is_complete:
+        raise HTTPException(status_code=409, detail="Attachment upload is not complete")
+    
+    # Her kullanıcı kendi anahtarıyla şifreli kopyayı alır; Range / If-Range FileResponse tarafından işlenir
+    variant = SENDER if session.user_id == attachment.sender_id else RECEIVER
+    return FileResponse(
+        attachment_store.path_for(attachment.id, variant),
+        media_type="application/octet-stream",
+        headers={"Cache-Control": "private, max-age=86400"}
+    )
+
+
 @app.post("/logout")
-async def logout(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if user:
-        user.is_online = False
-        db.commit()
-        
-        await manager.broadcast_status(user.id, user.username, False)
+async def logout(
+    user_id: Optional[int] = None,
+    session: SessionClaims = Depends(current_session),
+    db: AsyncSession = Depends(get_db)
+):
+    user_id = require_user(session, user_id)
+    username = await set_user_online(db, user_id, False)
+    if username:
+        await router.logout(user_id, username)
     
     return {"message": "Çıkış yapıldı"}
 
 
-@app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
+def parse_user_ids(value) -> List[int]:
+    if not isinstance(value, list):
+        return []
+    return [uid for uid in value if isinstance(uid, int) and not isinstance(uid, bool)]
+
+
+# İstemcinin ack beklemeden art arda gönderebileceği mesaj sayısı
+WS_MAX_PIPELINED_SENDS = 64
+
+# Bağlantı kapandıktan sonra kuyruktaki gönderimleri bitiren görevler
+ws_send_workers = set()
+
 
-    await manager.connect(websocket, user_id)
+async def handle_ws_send(db: AsyncSession, connection, session: SessionClaims, frame: dict):
+    client_id = frame.get("client_id")
+    try:
+        msg = MessageCreate(
+            sender_id=session.user_id,
+            receiver_id=frame.get("receiver_id"),
+            encrypted_content=frame.get("encrypted_content"),
+            client_message_id=client_id,
+            attachment_id=frame.get("attachment_id")
+        )
+    except ValidationError as e:
+        await manager.send_to_connection(
+            {"type": "error", "client_id": client_id, "detail": e.errors(include_url=False, include_context=False, include_input=False)},
+            connection
+        )
+        return
     
-    db = SessionLocal()
     try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            user.is_online = True
-            db.commit()
-            await manager.broadcast_status(user_id, user.username, True)
-    finally:
-        db.close()
+        ack = await deliver_message(db, msg, session)
+    except HTTPException as e:
+        await db.rollback()
+        await manager.send_to_connection({"type": "error", "client_id": client_id, "detail": e.detail}, connection)
+        return
+    except Exception as e:
+        await db.rollback()
+        logger.error("WebSocket send failed for user %s: %s", session.user_id, type(e).__name__)
+        await manager.send_to_connection(
+            {"type": "error", "client_id": client_id, "detail": "Message processing failed"},
+            connection
+        )
+        return
+    
+    await manager.send_to_connection({"type": "ack", "client_id": client_id, **ack}, connection)
+
+
+async def process_ws_sends(connection, session: SessionClaims, queue: asyncio.Queue):
+    # Gönderimler sırayla işlenir, istemci ack beklemeden yenilerini yollayabilir.
+    # Her çerçeve kısa ömürlü oturum alır: boştaki soket havuzdan bağlantı (açık işlem) tutmaz
+    while True:
+        frame = await queue.get()
+        if frame is None:
+            return
+        await with_session(handle_ws_send, connection, session, frame)
+
+
+async def handle_ws_message(connection, message: dict, pending: PendingFlush):
+    msg_type = message.get("type")
+    
+    if msg_type == "ping":
+        await manager.send_to_connection({"type": "pong"}, connection)
+    
+    elif msg_type == "subscribe":
+        # İstemci yalnızca ilgilendiği kullanıcıların (kişiler, açık sohbetler) durumunu alır
+        user_ids = parse_user_ids(message.get("user_ids"))
+        online = presence.subscribe(connection, user_ids)
+        await manager.send_to_connection(
+            {"type": "presence", "user_ids": user_ids, "online": online},
+            connection
+        )
+    
+    elif msg_type == "pending_ack":
+        await pending.ack(message.get("last_id"))
+    
+    elif msg_type == "unsubscribe":
+        presence.unsubscribe(connection, parse_user_ids(message.get("user_ids")))
+
+
+async def close_user_session(user_id: int, username: str):
+    await router.connection_closed(user_id, username)
+    if not router.is_online(user_id):
+        await with_session(set_user_online, user_id, False)
+
+
+@app.websocket("/ws/{user_id}")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    user_id: int,
+    last_seen_id: Optional[int] = None
+):
+    # Jeton el sıkışmadaki Authorization başlığıyla gelir (sorgu parametresi erişim loglarına yazılırdı)
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    try:
+        session = session_tokens.verify(token) if scheme.lower() == "bearer" else None
+    except InvalidToken:
+        session = None
+    if session is None or session.user_id != user_id:
+        # accept öncesi kapatma: el sıkışma 403 ile reddedilir
+        await websocket.close(code=1008)
+        return
+
+    connection = await manager.connect(websocket, user_id)
+    
+    username = await with_session(set_user_online, user_id, True)
+    if username:
+        await router.connection_opened(user_id, username)
+    
+    # Çevrimdışıyken gelen mesajlar; istemci son gördüğü id'den devam eder
+    pending = PendingFlush(manager, connection, user_id, last_seen_id)
+    pending.start()
+    
+    send_queue = asyncio.Queue(maxsize=WS_MAX_PIPELINED_SENDS)
+    send_worker = None
     
     try:
         while True:
@@ -344,26 +935,40 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int):
             
             try:
                 message = json.loads(data)
-                if message.get("type") == "ping":
-                    await websocket.send_json({"type": "pong"})
             except json.JSONDecodeError:
-                pass
+                continue
+            if not isinstance(message, dict):
+                continue
+            
+            if message.get("type") == "send":
+                if send_worker is None:
+                    send_worker = asyncio.create_task(process_ws_sends(connection, session, send_queue))
+                    ws_send_workers.add(send_worker)
+                    send_worker.add_done_callback(ws_send_workers.discard)
+                # Kuyruk doluysa soket okuması durur (geri basınç)
+                await send_queue.put(message)
+            else:
+                await handle_ws_message(connection, message, pending)
                 
     except WebSocketDisconnect:
-        manager.disconnect(websocket, user_id)
-        
-        db = SessionLocal()
-        try:
-            user = db.query(User).filter(User.id == user_id).first()
-            if user:
-                user.is_online = False
-                db.commit()
-                await manager.broadcast_status(user_id, user.username, False)
-        finally:
-            db.close()
+        logger.debug("Client %s disconnected", user_id)
+    except Exception:
+        logger.exception("WebSocket error for user %s", user_id)
+    finally:
+        pending.cancel()
+        if send_worker is not None:
+            # Alınmış gönderimler bağlantı kapansa da kaydedilir; işçi iptal edilmez, kuyruğu bitirip durur.
+            # Okuma durduğu için kuyruk artık büyümez: doluysa bitiş işareti ilk boşalan yere ayrı görevle eklenir
+            try:
+                send_queue.put_nowait(None)
+            except asyncio.QueueFull:
+                closer = asyncio.create_task(send_queue.put(None))
+                ws_send_workers.add(closer)
+                closer.add_done_callback(ws_send_workers.discard)
+        manager.disconnect(connection)
+        presence.remove_connection(connection)
         
-        print(f"Client {user_id} disconnected")
-    except Exception as e:
-        print(f"WebSocket error for user {user_id}: {e}")
-        manager.disconnect(websocket, user_id)
-
+        # Kullanıcının başka cihazı bağlıysa çevrimiçi kalır
+        if username and not manager.is_connected(user_id):
+            # Görev iptal edilse (sunucu kapanışı) bile durum güncellemesi tamamlanır
+            await asyncio.shield(close_user_session(user_id, username))
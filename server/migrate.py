@@ -0,0 +1,133 @@
+from sqlalchemy import inspect, text, update
+
+# Migration'lar tek seferlik çalışır; senkron motor yeterli
+from database import sync_engine as engine, SessionLocal
+from log import get_logger, setup_logging
+from models import Base, User, Message
+from services.blob_store import blob_store
+from services.crypto_service import transcode_batch
+
+
+logger = get_logger("migrate")
+
+BATCH_SIZE = 500
+IMAGE_BATCH_SIZE = 20
+
+
+def add_column_if_missing(table: str, column: str, ddl: str):
+    columns = [c["name"] for c in inspect(engine).get_columns(table)]
+    if column in columns:
+        return False
+
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    logger.info("Migration: %s.%s eklendi", table, column)
+    return True
+
+
+def create_indexes():
+    # create_all var olan tablolara yeni index eklemez
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def backfill_sender_encrypted_content(batch_size: int = BATCH_SIZE) -> int:
+    # Eski mesajlar için gönderen kopyasını üretir: alıcı anahtarından gönderen anahtarına toplu çeviri
+    db = SessionLocal()
+    total = 0
+    try:
+        pairs = db.query(Message.sender_id, Message.receiver_id).filter(
+            Message.sender_encrypted_content.is_(None)
+        ).distinct().all()
+
+        for sender_id, receiver_id in pairs:
+            sender = db.query(User.password).filter(User.id == sender_id).first()
+            receiver = db.query(User.password).filter(User.id == receiver_id).first()
+            if not sender or not receiver:
+                logger.warning("Backfill: user missing for pair %s -> %s, skipped", sender_id, receiver_id)
+                continue
+
+            last_id = 0
+            while True:
+                rows = db.query(Message.id, Message.encrypted_content).filter(
+                    Message.sender_id == sender_id,
+                    Message.receiver_id == receiver_id,
+                    Message.sender_encrypted_content.is_(None),
+                    Message.id > last_id
+                ).order_by(Message.id).limit(batch_size).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                batch = transcode_batch(
+                    [r.encrypted_content for r in rows],
+                    receiver.password,
+                    sender.password
+                )
+                updates = [
+                    {"id": r.id, "sender_encrypted_content": encrypted_for_sender}
+                    for r, encrypted_for_sender in zip(rows, batch)
+                    if encrypted_for_sender is not None
+                ]
+                if updates:
+                    db.execute(update(Message), updates)
+                    db.commit()
+                    total += len(updates)
+
+        logger.info("Backfill: %s messages updated", total)
+        return total
+    finally:
+        db.close()
+
+
+def move_stego_images_to_blob_store(batch_size: int = IMAGE_BATCH_SIZE) -> int:
+    # users.stego_image içindeki resimleri blob deposuna taşır, satırda yalnızca özeti bırakır
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE users ALTER COLUMN stego_image DROP NOT NULL"))
+    
+    db = SessionLocal()
+    total = 0
+    try:
+        last_id = 0
+        while True:
+            rows = db.query(User.id, User.stego_image).filter(
+                User.stego_image.isnot(None),
+                User.stego_digest.is_(None),
+                User.id > last_id
+            ).order_by(User.id).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            
+            updates = [
+                {"id": r.id, "stego_digest": blob_store.put(r.stego_image), "stego_image": None}
+                for r in rows
+            ]
+            db.execute(update(User), updates)
+            db.commit()
+            total += len(updates)
+        
+        logger.info("Blob store: %s images moved", total)
+        return total
+    finally:
+        db.close()
+
+
+def run_migrations():
+    Base.metadata.create_all(bind=engine)
+    add_column_if_missing("messages", "sender_encrypted_content", "VARCHAR")
+    add_column_if_missing("users", "stego_digest", "VARCHAR(64)")
+    add_column_if_missing("messages", "client_message_id", "VARCHAR(64)")
+    add_column_if_missing("users", "key_version", "INTEGER NOT NULL DEFAULT 1")
+    add_column_if_missing("users", "password_hash", "VARCHAR(255)")
+    add_column_if_missing("messages", "attachment_id", "INTEGER REFERENCES attachments(id)")
+    create_indexes()
+    backfill_sender_encrypted_content()
+    move_stego_images_to_blob_store()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    run_migrations()
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, LargeBinary, Text
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import BigInteger, Column, Integer, String, Boolean, ForeignKey, DateTime, LargeBinary, Text, Index
+from sqlalchemy.orm import relationship, declarative_base, deferred
 from datetime import datetime
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 
 
 Base = declarative_base()
@@ -12,10 +12,21 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
     
-    stego_image = Column(LargeBinary, nullable=False)
+    # Resim baytları blob deposunda tutulur; satırda yalnızca sha256 özeti bulunur
+    stego_digest = Column(String(64), nullable=True)
     
+    # Eski kayıtlar için; migrate.py ile blob deposuna taşınır
+    stego_image = deferred(Column(LargeBinary, nullable=True))
+    
+    # Sunucu tarafı yeniden şifreleme için anahtar malzemesi; giriş doğrulaması password_hash ile yapılır
     password = Column(Text, nullable=False)
 
+    # scrypt özeti; eski kayıtlarda ilk başarılı girişte hesaplanır
+    password_hash = Column(String(255), nullable=True)
+
+    # Anahtar (parola) değişince artar; oturum jetonlarındaki sürümle karşılaştırılır
+    key_version = Column(Integer, nullable=False, default=1, server_default="1")
+
     is_online = Column(Boolean, default=False)
 
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -35,6 +46,20 @@ class User(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Sohbet geçmişi sorguları ve keyset sayfalama için
+        Index("ix_messages_conversation", "sender_id", "receiver_id", "created_at"),
+        # Okunmamış mesaj sayıları için yalnızca is_read = false satırları
+        Index(
+            "ix_messages_unread",
+            "receiver_id",
+            "sender_id",
+            postgresql_where=text("is_read = false"),
+            sqlite_where=text("is_read = 0")
+        ),
+        # İstemci kimliğiyle tekrar gönderilen mesaj ikinci kez kaydedilmez
+        Index("ux_messages_client_id", "sender_id", "client_message_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -43,6 +68,15 @@ class Message(Base):
 
     encrypted_content = Column(String, nullable=False)
 
+    # Gönderenin kendi anahtarıyla şifrelenmiş kopya (geçmiş okumada yeniden şifreleme gerekmez)
+    sender_encrypted_content = Column(String, nullable=True)
+
+    # İstemcinin ürettiği kimlik (idempotency); WebSocket "send" ve HTTP tekrar denemeleri için
+    client_message_id = Column(String(64), nullable=True)
+
+    # Dosya eki (isteğe bağlı); içerik attachments tablosunda ve diskte
+    attachment_id = Column(Integer, ForeignKey("attachments.id"), nullable=True)
+
    
     is_delivered = Column(Boolean, default=False)
     is_read = Column(Boolean, default=False)
@@ -68,4 +102,26 @@ class Message(Base):
         elif self.is_delivered:
             return "delivered"
         else:
-            return "sent"
\ No newline at end of file
+            return "sent"
+
+
+class Attachment(Base):
+    __tablename__ = "attachments"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    receiver_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    # İstemcinin bildirdiği ad ve tür; içerik gönderenin anahtarıyla akış biçiminde (aead) şifreli yüklenir
+    file_name = Column(String(255), nullable=False)
+    media_type = Column(String(127), nullable=False)
+
+    # Şifreli içeriğin boyutu; received_size diske yazılmış kısım (yükleme buradan devam eder)
+    size = Column(BigInteger, nullable=False)
+    received_size = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+    # Alıcının anahtarıyla yeniden şifrelenmiş kopya hazır
+    is_complete = Column(Boolean, default=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 
 class UserCreate(BaseModel):
     username: str
@@ -6,8 +7,20 @@ class UserCreate(BaseModel):
 
 
 class MessageCreate(BaseModel):
-    sender_id: int
+    # Oturum jetonundan alınır; gönderilirse jetondaki kullanıcıyla aynı olmalı
+    sender_id: Optional[int] = None
     receiver_id: int
     encrypted_content: str
+    client_message_id: Optional[str] = Field(None, min_length=1, max_length=64)
+    # Tamamlanmış bir ek (POST /attachments ile oluşturulan)
+    attachment_id: Optional[int] = None
+
+
+class AttachmentCreate(BaseModel):
+    receiver_id: int
+    file_name: str = Field(..., min_length=1, max_length=255)
+    media_type: str = Field("application/octet-stream", min_length=1, max_length=127)
+    # Şifreli (akış biçimi) içeriğin bayt cinsinden boyutu
+    size: int = Field(..., gt=0)
 
 
@@ -0,0 +1,199 @@
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterable, AsyncIterator, BinaryIO
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: yalnızca süreç içi koruma (tek worker)
+    fcntl = None
+
+from config import ATTACHMENT_DIR
+from services.crypto_service import transcode_file
+from services.executors import run_io
+
+
+SENDER = "sender"
+RECEIVER = "receiver"
+# Diske yazmadan önce biriktirilen en fazla bayt (küçük ağ parçaları için thread geçişi azalır)
+WRITE_BUFFER_BYTES = 256 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UploadInProgress(RuntimeError):
+    pass
+
+
+def _sync_close(f: BinaryIO):
+    # Dosyanın kapanması kilidi de bırakır
+    try:
+        f.flush()
+        os.fsync(f.fileno())
+    finally:
+        f.close()
+
+
+class AttachmentUpload:
+    # Kilitli yarım dosyaya tek bir isteğin yazması
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+
+    def _seek(self, offset: int):
+        # Yarıda kalmış bir isteğin onaylanmamış baytları atılır: dosya kayıtlı boyuta kırpılır, yazma oradan devam eder
+        self.f.truncate(offset)
+        self.f.seek(offset)
+
+    async def write(self, offset: int, chunks: AsyncIterable[bytes], limit: int) -> int:
+        # offset'ten itibaren en fazla limit bayt yazar; dönen değer yazılan bayt sayısı
+        await run_io(self._seek, offset)
+        written = 0
+        buffer = bytearray()
+        async for chunk in chunks:
+            if written + len(buffer) + len(chunk) > limit:
+                raise UploadTooLarge("Upload exceeds the declared attachment size")
+            buffer += chunk
+            if len(buffer) >= WRITE_BUFFER_BYTES:
+                await run_io(self.f.write, buffer)
+                written += len(buffer)
+                buffer = bytearray()
+        if buffer:
+            await run_io(self.f.write, buffer)
+            written += len(buffer)
+        return written
+
+
+class AttachmentStore:
+    # Ek dosyaları: <root>/<id % 256>/<id>.sender (yüklenen) ve <id>.receiver (alıcının anahtarıyla).
+    # İçerik her zaman parça parça okunur/yazılır; dosya boyutundan bağımsız olarak bellekte en fazla bir tampon tutulur
+
+    def __init__(self, root: str):
+        self.root = root
+        # Aynı eke eşzamanlı iki yükleme dosyayı bozmasın (süreç içi)
+        self.active = set()
+
+    def path_for(self, attachment_id: int, variant: str) -> str:
+        if variant not in (SENDER, RECEIVER):
+            raise ValueError(f"Invalid attachment variant: {variant!r}")
+        return os.path.join(self.root, f"{attachment_id % 256:02x}", f"{int(attachment_id)}.{variant}")
+
+    def exists(self, attachment_id: int, variant: str) -> bool:
+        return os.path.exists(self.path_for(attachment_id, variant))
+
+    def open_upload(self, attachment_id: int) -> BinaryIO:
+        # Yarım dosyada özel kilit: başka bir worker aynı eke yazıyorsa beklemeden UploadInProgress
+        path = self.path_for(attachment_id, SENDER)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        f = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o600), "r+b")
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                raise UploadInProgress("Upload already in progress")
+        return f
+
+    @asynccontextmanager
+    async def upload(self, attachment_id: int) -> AsyncIterator[AttachmentUpload]:
+        # Kilit blok boyunca tutulur: çağıran kayıtlı konumu kilit altında yeniden okuyup doğrular,
+        # yazar ve yeni konumu kaydeder; iki worker aynı konumdan ekleme yapamaz
+        if attachment_id in self.active:
+            raise UploadInProgress("Upload already in progress")
+        self.active.add(attachment_id)
+        try:
+            f = await run_io(self.open_upload, attachment_id)
+            try:
+                yield AttachmentUpload(f)
+            finally:
+                await run_io(_sync_close, f)
+        finally:
+            self.active.discard(attachment_id)
+
+    def transcode(self, attachment_id: int, source_password: str, target_password: str) -> int:
+        # Gönderen kopyası alıcının anahtarına akış halinde çevrilir; yarım dosya görünmesin diye geçici dosyadan taşınır
+        target = self.path_for(attachment_id, RECEIVER)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp-")
+        try:
+            with open(self.path_for(attachment_id, SENDER), "rb") as reader, os.fdopen(fd, "wb") as writer:
+                written = transcode_file(reader, writer, source_password, target_password)
+                writer.flush()
+                os.fsync(writer.fileno())
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return written
+
+    def delete(self, attachment_id: int, variant: str = None):
+        for v in (variant,) if variant else (SENDER, RECEIVER):
+            try:
+                os.remove(self.path_for(attachment_id, v))
+            except FileNotFoundError:
+                pass
+
+
+attachment_store = AttachmentStore(ATTACHMENT_DIR)
+
+
+if __name__ == "__main__":
+    import asyncio
+    import shutil
+
+    from services.crypto_service import iter_decrypt, iter_encrypt
+    from services.executors import shutdown_executors
+
+    root = tempfile.mkdtemp(prefix="attachments-")
+    store = AttachmentStore(root)
+    data = os.urandom(3 * 1024 * 1024 + 5)
+    encrypted = b"".join(iter_encrypt([data], "sender88"))
+
+    async def chunks(payload: bytes, size: int = 64 * 1024):
+        for i in range(0, len(payload), size):
+            yield payload[i:i + size]
+
+    async def write(store: AttachmentStore, offset: int, payload: bytes, limit: int) -> int:
+        async with store.upload(7) as upload:
+            return await upload.write(offset, chunks(payload), limit)
+
+    async def main():
+        # İlk istek yarıda kesildi: diskte 1 MiB + fazlası var ama yalnızca 1 MiB onaylandı
+        first = await write(store, 0, encrypted[:1024 * 1024 + 100], len(encrypted))
+        assert first == 1024 * 1024 + 100
+        rest = await write(store, 1024 * 1024, encrypted[1024 * 1024:], len(encrypted) - 1024 * 1024)
+        assert rest == len(encrypted) - 1024 * 1024
+        try:
+            await write(store, len(encrypted), b"x", 0)
+            raise AssertionError("limit")
+        except UploadTooLarge:
+            pass
+        # Aynı kök dizinde ikinci bir worker (ayrı süreç içi küme) kilitli dosyaya yazamaz
+        if fcntl is not None:
+            other = AttachmentStore(root)
+            async with store.upload(7):
+                try:
+                    async with other.upload(7):
+                        raise AssertionError("lock")
+                except UploadInProgress:
+                    pass
+            async with other.upload(7):
+                pass
+
+    asyncio.run(main())
+    store.transcode(7, "sender88", "receive8")
+    with open(store.path_for(7, RECEIVER), "rb") as f:
+        assert b"".join(iter_decrypt(iter(lambda: f.read(65536), b""), "receive8")) == data
+    try:
+        store.transcode(7, "wrongpw1", "receive8")
+        raise AssertionError("wrong key")
+    except ValueError:
+        pass
+    store.delete(7)
+    assert not store.exists(7, SENDER) and not store.exists(7, RECEIVER)
+    shutdown_executors()
+    shutil.rmtree(root)
+    print("✓ Attachment store test başarılı!")
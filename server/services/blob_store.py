@@ -0,0 +1,75 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from config import BLOB_STORE_DIR
+
+
+_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+_MEDIA_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+def validate_digest(digest: str) -> str:
+    if not _DIGEST_PATTERN.match(digest):
+        raise ValueError(f"Invalid blob digest: {digest!r}")
+    return digest
+
+
+class BlobStore:
+    # Dosyalar sha256 özetleriyle adlandırılır: <root>/<ilk 2 karakter>/<özet>
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def path_for(self, digest: str) -> str:
+        validate_digest(digest)
+        return os.path.join(self.root, digest[:2], digest)
+    
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path_for(digest))
+    
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return digest
+        
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        
+        # Yarım yazılmış dosya görünmesin diye önce geçici dosyaya yazılır, sonra atomik olarak taşınır
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+    
+    def get(self, digest: str) -> bytes:
+        with open(self.path_for(digest), "rb") as f:
+            return f.read()
+    
+    def media_type(self, digest: str) -> str:
+        # Dosya imzasından içerik türü; bilinmiyorsa genel ikili tür
+        with open(self.path_for(digest), "rb") as f:
+            head = f.read(12)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return "image/webp"
+        for signature, media_type in _MEDIA_SIGNATURES:
+            if head.startswith(signature):
+                return media_type
+        return "application/octet-stream"
+
+
+blob_store = BlobStore(BLOB_STORE_DIR)
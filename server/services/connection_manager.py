@@ -0,0 +1,146 @@
+import asyncio
+import json
+from typing import Dict, List
+
+from config import WS_OVERFLOW_POLICY, WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop")
+
+# Yavaş istemci kapatma kodu (RFC 6455: 1008 policy violation)
+SLOW_CONSUMER_CLOSE_CODE = 1008
+
+
+class Connection:
+    # Tek bir WebSocket: sınırlı giden kuyruk + kuyruğu boşaltan yazıcı görev
+
+    def __init__(self, websocket, user_id: int, queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self.writer = asyncio.create_task(self._write_loop())
+
+    async def _write_loop(self):
+        try:
+            while True:
+                data = await self.queue.get()
+                await self.websocket.send_text(data)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning("Error sending to user %s: %s", self.user_id, type(e).__name__)
+        finally:
+            self.closed = True
+
+
+class ConnectionManager:
+
+    def __init__(self, queue_size: int = WS_SEND_QUEUE_SIZE, send_timeout: float = WS_SEND_TIMEOUT,
+                 overflow_policy: str = WS_OVERFLOW_POLICY):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.active_connections: Dict[int, List[Connection]] = {}
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.overflow_policy = overflow_policy
+        self.dropped = 0
+        # Kapatma görevleri (referans tutulmazsa GC bitmeden toplayabilir)
+        self.close_tasks = set()
+
+    async def connect(self, websocket, user_id: int) -> Connection:
+        await websocket.accept()
+        connection = Connection(websocket, user_id, self.queue_size)
+        self.active_connections.setdefault(user_id, []).append(connection)
+        logger.debug("WebSocket connected: user_id=%s connections=%s", user_id, len(self.active_connections[user_id]))
+        return connection
+
+    def disconnect(self, connection: Connection):
+        connections = self.active_connections.get(connection.user_id)
+        if connections and connection in connections:
+            connections.remove(connection)
+            if not connections:
+                del self.active_connections[connection.user_id]
+            logger.debug("WebSocket disconnected: user_id=%s", connection.user_id)
+        connection.closed = True
+        connection.writer.cancel()
+
+    def is_connected(self, user_id: int) -> bool:
+        return user_id in self.active_connections
+
+    def _drop(self, connection: Connection):
+        # Kuyruğu dolan istemci diğerlerini bekletmesin: bağlantı kapatılır, istemci yeniden bağlanır
+        if connection.closed:
+            return
+        self.dropped += 1
+        logger.warning("Slow WebSocket consumer dropped: user_id=%s", connection.user_id)
+        self.disconnect(connection)
+        task = asyncio.create_task(self._close(connection))
+        self.close_tasks.add(task)
+        task.add_done_callback(self.close_tasks.discard)
+
+    async def _close(self, connection: Connection):
+        try:
+            await connection.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+
+    def _try_enqueue(self, connection: Connection, data: str) -> bool:
+        if connection.closed:
+            self.disconnect(connection)
+            return True
+        try:
+            connection.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            if self.overflow_policy == "drop":
+                self._drop(connection)
+                return True
+            return False
+
+    async def _enqueue_blocking(self, connection: Connection, data: str):
+        # Geri basınç: gönderen, kuyrukta yer açılmasını en fazla send_timeout kadar bekler
+        try:
+            await asyncio.wait_for(connection.queue.put(data), self.send_timeout)
+        except asyncio.TimeoutError:
+            self._drop(connection)
+
+    async def _enqueue_all(self, connections: List[Connection], data: str):
+        # Hızlı yol senkron; yalnızca kuyruğu dolu bağlantılar eşzamanlı beklenir
+        waiting = [c for c in connections if not self._try_enqueue(c, data)]
+        if waiting:
+            await asyncio.gather(*(self._enqueue_blocking(c, data) for c in waiting))
+
+    async def send_to_connection(self, message: dict, connection: Connection):
+        await self._enqueue_all([connection], json.dumps(message))
+
+    async def send_personal_message(self, message: dict, user_id: int):
+        connections = self.active_connections.get(user_id)
+        if connections:
+            await self._enqueue_all(list(connections), json.dumps(message))
+
+    async def send_to_connections(self, message: dict, connections: List[Connection]):
+        # JSON bir kez üretilir, aynı metin tüm kuyruklara eklenir
+        if connections:
+            await self._enqueue_all(connections, json.dumps(message))
+
+    def connection_count(self) -> int:
+        return sum(len(conns) for conns in self.active_connections.values())
+
+    def queue_depth(self) -> int:
+        return sum(c.queue.qsize() for conns in self.active_connections.values() for c in conns)
+
+    async def close_all(self):
+        connections = [c for conns in self.active_connections.values() for c in conns]
+        for connection in connections:
+            self.disconnect(connection)
+        if connections:
+            await asyncio.gather(*(c.writer for c in connections), return_exceptions=True)
+        if self.close_tasks:
+            await asyncio.gather(*self.close_tasks, return_exceptions=True)
+
+
+manager = ConnectionManager()
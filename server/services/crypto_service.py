@@ -1,61 +1,411 @@
-
 import base64
-from Crypto.Cipher import DES
+import binascii
+import os
+import struct
+from functools import lru_cache
+from typing import AsyncIterable, BinaryIO, Iterable, Iterator, AsyncIterator, List, Optional
+from Crypto.Cipher import AES, DES
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
+
+
+CIPHER_CACHE_SIZE = 4096
+
+# Akış biçimi (v1): başlık + parçalar; her parça AES-256-GCM ile ayrı doğrulanır.
+# Başlık: MAGIC | sürüm | parça boyu (u32) | tuz (16) | nonce öneki (7)
+# Parça nonce'u: önek | sıra no (u32) | son parça bayrağı; başlık her parçanın ek verisidir (AAD).
+# Tam boy parça hiçbir zaman son parça değildir; veri parça boyunun katıysa sonda boş bir son parça yazılır.
+STREAM_MAGIC = b"SCS"
+STREAM_VERSION = 1
+STREAM_CHUNK_SIZE = 64 * 1024
+# Çözerken başlıktaki parça boyu bu sınırı aşamaz (bellek sınırı)
+STREAM_MAX_CHUNK_SIZE = 4 * 1024 * 1024
+STREAM_SALT_BYTES = 16
+STREAM_NONCE_PREFIX_BYTES = 7
+STREAM_TAG_BYTES = 16
+STREAM_HEADER = struct.Struct(f">3sBI{STREAM_SALT_BYTES}s{STREAM_NONCE_PREFIX_BYTES}s")
+STREAM_KDF_INFO = b"securechat stream v1"
+# Metin (veritabanı / JSON) biçimi: önek + base64; eski DES base64 metinleri ':' içermez
+STREAM_TEXT_PREFIX = "aead:"
+
+# Her dolgu uzunluğu için hazır PKCS7 blokları (1..8)
+_PKCS7_PADDING = [bytes([n]) * n for n in range(9)]
 
 
 def pad_password(password: str) -> bytes:
-    password_bytes = password.encode('utf-8')
-    key = bytearray(8)
-    for i in range(8):
-        if i < len(password_bytes):
-            key[i] = password_bytes[i]
-        else:
-            key[i] = 0x00
-    return bytes(key)
+    return password.encode('utf-8')[:8].ljust(8, b'\x00')
+
+
+@lru_cache(maxsize=CIPHER_CACHE_SIZE)
+def get_cipher(password: str):
+    # ECB durumsuzdur; anahtar takvimi bir kez hazırlanıp aynı parola için tekrar kullanılır
+    return DES.new(pad_password(password), DES.MODE_ECB)
 
 
 def pkcs7_pad(data: bytes, block_size: int = 8) -> bytes:
+    # Düz metin bir kez kopyalanır; 64 KB'de bile maliyeti DES şifrelemesinin yanında ölçülemeyecek kadar küçük
     padding_length = block_size - (len(data) % block_size)
-    if padding_length == 0:
-        padding_length = block_size
-    padding = bytes([padding_length] * padding_length)
-    return data + padding
-
-
-def pkcs7_unpad(data: bytes) -> bytes:
-    if not data:
-        return data
-    padding_length = data[-1]
-    if not isinstance(padding_length, int) or padding_length < 1 or padding_length > 8:
-        return data
+    padding = _PKCS7_PADDING[padding_length] if block_size == 8 else bytes([padding_length]) * padding_length
+    # join her türlü bytes benzeri girdiyi (memoryview dahil) kabul eder
+    return b"".join((data, padding))
+
+
+def pkcs7_unpad(data: bytes) -> memoryview:
+    # Kopyalamadan, dolgusuz kısmı gösteren bir memoryview döner
+    view = memoryview(data)
+    if not view:
+        return view
+    padding_length = view[-1]
+    if padding_length < 1 or padding_length > 8 or padding_length > len(view):
+        return view
     
-    if all(b == padding_length for b in data[-padding_length:]):
-        return data[:-padding_length]
-    return data
+    if view[-padding_length:] == _PKCS7_PADDING[padding_length]:
+        return view[:-padding_length]
+    return view
 
 
 def des_encrypt(plain_text: str, password: str) -> str:
-    key = pad_password(password)
-    plain_bytes = plain_text.encode('utf-8')
-    
-    padded_data = pkcs7_pad(plain_bytes, 8)
-    
-    cipher = DES.new(key, DES.MODE_ECB)
-    encrypted_bytes = cipher.encrypt(padded_data)
+    padded_data = pkcs7_pad(plain_text.encode('utf-8'), 8)
+    encrypted_bytes = get_cipher(password).encrypt(padded_data)
     
     return base64.b64encode(encrypted_bytes).decode('utf-8')
 
 
 def des_decrypt(cipher_b64: str, password: str) -> str:
-    key = pad_password(password)
     encrypted_bytes = base64.b64decode(cipher_b64)
+    decrypted_padded = get_cipher(password).decrypt(encrypted_bytes)
     
-    cipher = DES.new(key, DES.MODE_ECB)
-    decrypted_padded = cipher.decrypt(encrypted_bytes)
-    
-    decrypted_bytes = pkcs7_unpad(decrypted_padded)
-    
-    return decrypted_bytes.decode('utf-8')
+    return str(pkcs7_unpad(decrypted_padded), 'utf-8')
+
+
+def des_transcode_batch(cipher_b64_list: List[str], source_password: str, target_password: str) -> List[Optional[str]]:
+    # Tüm mesajlar tek bir decrypt ve tek bir encrypt çağrısından geçer (ECB bloklar bağımsız).
+    # base64 her mesajda ayrı: dolgulu metinler birleştirilip tek seferde çözülemez; doğrudan binascii kullanılır.
+    # Çözülemeyen mesajlar için sonuç listesinde None döner.
+    source_cipher = get_cipher(source_password)
+    target_cipher = get_cipher(target_password)
+
+    encrypted_chunks = []
+    lengths = []
+    for cipher_b64 in cipher_b64_list:
+        try:
+            encrypted_bytes = binascii.a2b_base64(cipher_b64)
+        except Exception:
+            encrypted_bytes = None
+        if encrypted_bytes is None or len(encrypted_bytes) % 8 != 0:
+            lengths.append(None)
+            continue
+        encrypted_chunks.append(encrypted_bytes)
+        lengths.append(len(encrypted_bytes))
+
+    decrypted_all = memoryview(source_cipher.decrypt(b''.join(encrypted_chunks)))
+
+    padded_chunks = []
+    padded_lengths = []
+    offset = 0
+    for length in lengths:
+        if length is None:
+            padded_lengths.append(None)
+            continue
+        decrypted_bytes = pkcs7_unpad(decrypted_all[offset:offset + length])
+        offset += length
+        try:
+            str(decrypted_bytes, 'utf-8')
+        except UnicodeDecodeError:
+            padded_lengths.append(None)
+            continue
+        padded = pkcs7_pad(decrypted_bytes, 8)
+        padded_chunks.append(padded)
+        padded_lengths.append(len(padded))
+
+    encrypted_all = memoryview(target_cipher.encrypt(b''.join(padded_chunks)))
+
+    result = []
+    offset = 0
+    for length in padded_lengths:
+        if length is None:
+            result.append(None)
+            continue
+        result.append(binascii.b2a_base64(encrypted_all[offset:offset + length], newline=False).decode('ascii'))
+        offset += length
+    return result
+
+
+
+class StreamError(ValueError):
+    pass
+
+
+def _stream_key(password: str, salt: bytes) -> bytes:
+    # DES'ten farklı olarak parolanın tamamı kullanılır; her akış kendi tuzuyla ayrı anahtar alır
+    return HKDF(password.encode('utf-8'), 32, salt, SHA256, context=STREAM_KDF_INFO)
+
+
+class StreamEncryptor:
+    # Artımlı şifreleme: update() ile gelen veri parça boyu dolunca mühürlenir, bellekte en fazla bir parça tutulur
+
+    def __init__(self, password: str, chunk_size: int = STREAM_CHUNK_SIZE):
+        if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+            raise ValueError("Invalid chunk size")
+        salt = os.urandom(STREAM_SALT_BYTES)
+        self.chunk_size = chunk_size
+        self.header = STREAM_HEADER.pack(
+            STREAM_MAGIC, STREAM_VERSION, chunk_size, salt, os.urandom(STREAM_NONCE_PREFIX_BYTES)
+        )
+        self._key = _stream_key(password, salt)
+        self._nonce_prefix = self.header[-STREAM_NONCE_PREFIX_BYTES:]
+        self._counter = 0
+        self._buffer = bytearray()
+        self._header_sent = False
+        self._finalized = False
+
+    def _seal(self, data, final: bool) -> bytes:
+        if self._counter > 0xFFFFFFFF:
+            raise StreamError("Stream too long")
+        nonce = self._nonce_prefix + struct.pack(">IB", self._counter, final)
+        self._counter += 1
+        cipher = AES.new(self._key, AES.MODE_GCM, nonce=nonce, mac_len=STREAM_TAG_BYTES)
+        cipher.update(self.header)
+        encrypted, tag = cipher.encrypt_and_digest(data)
+        return encrypted + tag
+
+    def _take_header(self) -> List[bytes]:
+        if self._header_sent:
+            return []
+        self._header_sent = True
+        return [self.header]
+
+    def update(self, data) -> bytes:
+        if self._finalized:
+            raise StreamError("Stream already finalized")
+        out = self._take_header()
+        view = memoryview(data).cast("B")
+        if self._buffer:
+            need = self.chunk_size - len(self._buffer)
+            self._buffer += view[:need]
+            view = view[need:]
+            if len(self._buffer) < self.chunk_size:
+                return b"".join(out)
+            out.append(self._seal(self._buffer, False))
+            self._buffer = bytearray()
+        # Tam parçalar arabelleğe kopyalanmadan doğrudan girdiden mühürlenir
+        while len(view) >= self.chunk_size:
+            out.append(self._seal(view[:self.chunk_size], False))
+            view = view[self.chunk_size:]
+        self._buffer += view
+        return b"".join(out)
+
+    def finalize(self) -> bytes:
+        if self._finalized:
+            raise StreamError("Stream already finalized")
+        out = self._take_header()
+        out.append(self._seal(self._buffer, True))
+        self._buffer = bytearray()
+        self._finalized = True
+        return b"".join(out)
+
+
+class StreamDecryptor:
+    # Her parça ayrı doğrulanır ve hemen döner; kesilmiş akış ancak finalize() ile anlaşılır,
+    # bu yüzden finalize() başarılı olana kadar çıktı kesin sayılmamalı
+
+    def __init__(self, password: str):
+        self._password = password
+        self._buffer = bytearray()
+        self.header = None
+        self.chunk_size = None
+        self._key = None
+        self._counter = 0
+        self._finalized = False
+
+    def _parse_header(self):
+        magic, version, chunk_size, salt, nonce_prefix = STREAM_HEADER.unpack_from(self._buffer)
+        if magic != STREAM_MAGIC:
+            raise StreamError("Not a stream ciphertext")
+        if version != STREAM_VERSION:
+            raise StreamError(f"Unsupported stream version {version}")
+        if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+            raise StreamError("Invalid chunk size")
+        self.header = bytes(self._buffer[:STREAM_HEADER.size])
+        self.chunk_size = chunk_size
+        self._key = _stream_key(self._password, salt)
+        self._nonce_prefix = nonce_prefix
+        del self._buffer[:STREAM_HEADER.size]
+
+    def _open(self, record, final: bool) -> bytes:
+        if len(record) < STREAM_TAG_BYTES:
+            raise StreamError("Truncated stream")
+        nonce = self._nonce_prefix + struct.pack(">IB", self._counter, final)
+        self._counter += 1
+        cipher = AES.new(self._key, AES.MODE_GCM, nonce=nonce, mac_len=STREAM_TAG_BYTES)
+        cipher.update(self.header)
+        try:
+            return cipher.decrypt_and_verify(record[:-STREAM_TAG_BYTES], record[-STREAM_TAG_BYTES:])
+        except ValueError:
+            raise StreamError("Authentication failed")
+
+    def update(self, data) -> bytes:
+        if self._finalized:
+            raise StreamError("Stream already finalized")
+        self._buffer += data
+        if self._key is None:
+            if len(self._buffer) < STREAM_HEADER.size:
+                return b""
+            self._parse_header()
+
+        record_size = self.chunk_size + STREAM_TAG_BYTES
+        if len(self._buffer) < record_size:
+            return b""
+        view = memoryview(self._buffer)
+        out = []
+        offset = 0
+        while len(view) - offset >= record_size:
+            out.append(self._open(view[offset:offset + record_size], False))
+            offset += record_size
+        view.release()
+        del self._buffer[:offset]
+        return b"".join(out)
+
+    def finalize(self) -> bytes:
+        if self._finalized:
+            raise StreamError("Stream already finalized")
+        if self._key is None:
+            raise StreamError("Truncated stream")
+        plain = self._open(bytes(self._buffer), True)
+        self._buffer = bytearray()
+        self._finalized = True
+        return plain
+
+
+def iter_encrypt(chunks: Iterable[bytes], password: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    encryptor = StreamEncryptor(password, chunk_size)
+    for chunk in chunks:
+        out = encryptor.update(chunk)
+        if out:
+            yield out
+    yield encryptor.finalize()
+
+
+def iter_decrypt(chunks: Iterable[bytes], password: str) -> Iterator[bytes]:
+    decryptor = StreamDecryptor(password)
+    for chunk in chunks:
+        out = decryptor.update(chunk)
+        if out:
+            yield out
+    out = decryptor.finalize()
+    if out:
+        yield out
+
+
+def iter_transcode(chunks: Iterable[bytes], source_password: str, target_password: str,
+                   chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    # Düz metin hiçbir zaman bütün olarak bellekte tutulmaz: parça parça çözülüp yeniden şifrelenir
+    return iter_encrypt(iter_decrypt(chunks, source_password), target_password, chunk_size)
+
+
+async def aiter_encrypt(chunks: AsyncIterable[bytes], password: str,
+                        chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    encryptor = StreamEncryptor(password, chunk_size)
+    async for chunk in chunks:
+        out = encryptor.update(chunk)
+        if out:
+            yield out
+    yield encryptor.finalize()
+
+
+async def aiter_decrypt(chunks: AsyncIterable[bytes], password: str) -> AsyncIterator[bytes]:
+    decryptor = StreamDecryptor(password)
+    async for chunk in chunks:
+        out = decryptor.update(chunk)
+        if out:
+            yield out
+    out = decryptor.finalize()
+    if out:
+        yield out
+
+
+def aiter_transcode(chunks: AsyncIterable[bytes], source_password: str, target_password: str,
+                    chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    return aiter_encrypt(aiter_decrypt(chunks, source_password), target_password, chunk_size)
+
+
+def _read_chunks(reader: BinaryIO, size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    while True:
+        chunk = reader.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write_all(chunks: Iterable[bytes], writer: BinaryIO) -> int:
+    written = 0
+    for chunk in chunks:
+        writer.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def encrypt_file(reader: BinaryIO, writer: BinaryIO, password: str, chunk_size: int = STREAM_CHUNK_SIZE) -> int:
+    # Dosya benzeri nesneler arasında; dönen değer yazılan bayt sayısı
+    return _write_all(iter_encrypt(_read_chunks(reader, chunk_size), password, chunk_size), writer)
+
+
+def decrypt_file(reader: BinaryIO, writer: BinaryIO, password: str) -> int:
+    return _write_all(iter_decrypt(_read_chunks(reader), password), writer)
+
+
+def transcode_file(reader: BinaryIO, writer: BinaryIO, source_password: str, target_password: str,
+                   chunk_size: int = STREAM_CHUNK_SIZE) -> int:
+    return _write_all(iter_transcode(_read_chunks(reader), source_password, target_password, chunk_size), writer)
+
+
+def is_stream_ciphertext(cipher_text: str) -> bool:
+    return cipher_text.startswith(STREAM_TEXT_PREFIX)
+
+
+def _stream_bytes(cipher_text: str) -> bytes:
+    try:
+        return base64.b64decode(cipher_text[len(STREAM_TEXT_PREFIX):], validate=True)
+    except ValueError:
+        raise StreamError("Invalid base64")
+
+
+def stream_encrypt_text(plain_text: str, password: str) -> str:
+    encrypted = b"".join(iter_encrypt([plain_text.encode('utf-8')], password))
+    return STREAM_TEXT_PREFIX + base64.b64encode(encrypted).decode('ascii')
+
+
+def decrypt_text(cipher_text: str, password: str) -> str:
+    # Biçime göre: akış metni veya eski DES base64
+    if is_stream_ciphertext(cipher_text):
+        return b"".join(iter_decrypt([_stream_bytes(cipher_text)], password)).decode('utf-8')
+    return des_decrypt(cipher_text, password)
+
+
+def transcode_text(cipher_text: str, source_password: str, target_password: str) -> str:
+    # Biçim korunur: eski DES istemcileri DES, akış biçimi yeniden akış biçimi alır
+    if is_stream_ciphertext(cipher_text):
+        encrypted = b"".join(iter_transcode([_stream_bytes(cipher_text)], source_password, target_password))
+        return STREAM_TEXT_PREFIX + base64.b64encode(encrypted).decode('ascii')
+    return des_encrypt(des_decrypt(cipher_text, source_password), target_password)
+
+
+def transcode_batch(cipher_texts: List[str], source_password: str, target_password: str) -> List[Optional[str]]:
+    # Eski DES mesajları tek toplu çağrıda, akış biçimindekiler tek tek dönüştürülür; hatalılar None
+    legacy_indexes = [i for i, c in enumerate(cipher_texts) if not is_stream_ciphertext(c)]
+    result: List[Optional[str]] = [None] * len(cipher_texts)
+    if legacy_indexes:
+        legacy = des_transcode_batch([cipher_texts[i] for i in legacy_indexes], source_password, target_password)
+        for i, transcoded in zip(legacy_indexes, legacy):
+            result[i] = transcoded
+    if len(legacy_indexes) < len(cipher_texts):
+        for i, cipher_text in enumerate(cipher_texts):
+            if is_stream_ciphertext(cipher_text):
+                try:
+                    result[i] = transcode_text(cipher_text, source_password, target_password)
+                except (StreamError, UnicodeDecodeError):
+                    result[i] = None
+    return result
 
 
 if __name__ == "__main__":
@@ -76,3 +426,63 @@ if __name__ == "__main__":
     
     assert mesaj == decrypted
     print("✓ Python → Python: SUCCESS")
+
+    print()
+    print("=== Batch Transcode Test ===")
+    other_password = "87654321"
+    mesajlar = ["Hello World!", "", "çok güzel", "x" * 100]
+    batch = [des_encrypt(m, password) for m in mesajlar] + ["bozuk!"]
+    transcoded = des_transcode_batch(batch, password, other_password)
+
+    assert transcoded[-1] is None
+    for m, c in zip(mesajlar, transcoded):
+        assert c == des_encrypt(m, other_password)
+        assert des_decrypt(c, other_password) == m
+    print("✓ Batch transcode: SUCCESS")
+
+    print()
+    print("=== Stream Test ===")
+    import io
+    import asyncio
+
+    for size in (0, 1, 1000, 4096, 4096 * 3, 4096 * 3 + 7):
+        data = os.urandom(size)
+        encrypted = b"".join(iter_encrypt([data[:100], data[100:]], password, chunk_size=4096))
+        # Parça sınırlarından bağımsız: tek bayt beslemede de aynı sonuç
+        assert b"".join(iter_decrypt((encrypted[i:i + 1] for i in range(len(encrypted))), password)) == data
+        out = io.BytesIO()
+        transcode_file(io.BytesIO(encrypted), out, password, other_password)
+        assert b"".join(iter_decrypt([out.getvalue()], other_password)) == data
+
+        for bad in (encrypted[:-1], encrypted[:STREAM_HEADER.size + 4096 + STREAM_TAG_BYTES] if size >= 4096 else b"",
+                    encrypted[:-1] + bytes([encrypted[-1] ^ 1])):
+            try:
+                b"".join(iter_decrypt([bad], password))
+                raise AssertionError("tampered stream accepted")
+            except StreamError:
+                pass
+        try:
+            b"".join(iter_decrypt([encrypted], other_password))
+            raise AssertionError("wrong password accepted")
+        except StreamError:
+            pass
+
+    async def chunks():
+        for part in (b"hello ", b"async ", b"world"):
+            yield part
+
+    async def collect(iterator):
+        return b"".join([c async for c in iterator])
+
+    encrypted = asyncio.run(collect(aiter_encrypt(chunks(), password, chunk_size=5)))
+    assert b"".join(iter_decrypt([encrypted], password)) == b"hello async world"
+    print("✓ Stream round trip / tamper / async: SUCCESS")
+
+    text = stream_encrypt_text(mesaj, password)
+    assert decrypt_text(text, password) == mesaj
+    encrypted_legacy = des_encrypt(mesaj, password)
+    assert decrypt_text(encrypted_legacy, password) == mesaj
+    mixed = transcode_batch([text, encrypted_legacy, "aead:bozuk"], password, other_password)
+    assert decrypt_text(mixed[0], other_password) == mesaj and mixed[0].startswith(STREAM_TEXT_PREFIX)
+    assert mixed[1] == des_encrypt(mesaj, other_password) and mixed[2] is None
+    print("✓ Mixed batch transcode: SUCCESS")
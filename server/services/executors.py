@@ -0,0 +1,83 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from config import AUTH_PROCESS_NICE, AUTH_PROCESS_WORKERS, CPU_PROCESS_WORKERS, IO_THREAD_WORKERS
+
+
+_io_executor = None
+_cpu_executor = None
+_auth_executor = None
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(max_workers=IO_THREAD_WORKERS, thread_name_prefix="io")
+    return _io_executor
+
+
+def _mp_context():
+    # fork, olay döngüsü ve IO thread'leri çalışırken kilitlerin kopyasını alabilir; işçiler temiz süreçten başlatılır
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def get_cpu_executor() -> ProcessPoolExecutor:
+    global _cpu_executor
+    if _cpu_executor is None:
+        _cpu_executor = ProcessPoolExecutor(max_workers=CPU_PROCESS_WORKERS, mp_context=_mp_context())
+    return _cpu_executor
+
+
+def _lower_priority(increment: int) -> None:
+    # Çekirdekler doluyken zamanlayıcı olay döngüsü sürecini öne alır
+    if increment and hasattr(os, "nice"):
+        os.nice(increment)
+
+
+def get_auth_executor() -> ProcessPoolExecutor:
+    # Parola özetleri ayrı havuzda: giriş yükü resim işleme ve diğer CPU işlerinin önüne geçmez
+    global _auth_executor
+    if _auth_executor is None:
+        _auth_executor = ProcessPoolExecutor(
+            max_workers=AUTH_PROCESS_WORKERS,
+            mp_context=_mp_context(),
+            initializer=_lower_priority,
+            initargs=(AUTH_PROCESS_NICE,)
+        )
+    return _auth_executor
+
+
+async def run_io(func, *args, **kwargs):
+    # Senkron DB sorguları ve disk işleri: olay döngüsü beklerken diğer istekleri ve WebSocket'leri işler
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), partial(func, *args, **kwargs))
+
+
+async def run_cpu(func, *args, **kwargs):
+    # GIL'i tutan CPU ağırlıklı işler (resim çözme): ayrı süreçte çalışır, argümanlar pickle ile taşınır
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), partial(func, *args, **kwargs))
+
+
+async def run_auth(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_auth_executor(), partial(func, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    global _io_executor, _cpu_executor, _auth_executor
+    # Süreç havuzları beklenir: kuyruktakiler iptal edilir, yalnızca çalışan tek iş biter ve
+    # işçiler düzgün kapanır (aksi halde forkserver işçileri ve semaforları ortada kalır)
+    if _auth_executor is not None:
+        _auth_executor.shutdown(wait=True, cancel_futures=True)
+        _auth_executor = None
+    if _cpu_executor is not None:
+        _cpu_executor.shutdown(wait=True, cancel_futures=True)
+        _cpu_executor = None
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=False, cancel_futures=True)
+        _io_executor = None
@@ -1,97 +1,187 @@
-
 from PIL import Image
 import io
+import struct
+import zlib
+import numpy as np
 
 
-def extract_password_from_image(image_bytes: bytes) -> str:
-    
+PASSWORD_LENGTH = 8
+PASSWORD_BITS = PASSWORD_LENGTH * 8
+
+# v1 başlığı: magic, sürüm, kanal başına bit, yük uzunluğu, CRC32.
+# 0xFF geçerli bir UTF-8 başlangıç baytı olmadığından eski 8 karakterlik parolalarla karışmaz.
+MAGIC = b'\xffSG'
+FORMAT_VERSION = 1
+MAX_BITS_PER_CHANNEL = 4
+HEADER_FORMAT = struct.Struct('>3sBBII')
+HEADER_BITS = HEADER_FORMAT.size * 8
+
+
+def _load_rows(image: Image.Image, rows: int) -> bool:
+    # Pillow'un iç alanlarına (tile, _size) dayanır: yalnızca beklenen tek 'zip' tile düzeninde denenir,
+    # çözücü hata verirse ya da sonuç beklenen boyutta değilse False döner ve çağıran tam çözüme düşer
+    width, height = image.size
+    if len(image.tile) != 1:
+        return False
+    codec, extents, offset, args = image.tile[0]
+    if codec != 'zip' or tuple(extents) != (0, 0, width, height):
+        return False
+    try:
+        image.tile = [(codec, (0, 0, width, rows), offset, args)]
+        image._size = (width, rows)
+        image.load()
+    except Exception:
+        return False
+    return image.size == (width, rows)
+
+
+def read_channel_prefix(image_bytes: bytes, channel_count: int) -> np.ndarray:
+    # Sadece ilk channel_count RGB kanal değerini (satır sırasıyla) düz bir dizi olarak döner.
+    # Taramalı olmayan PNG'lerde yalnızca gereken ilk satırlar çözülür, resmin tamamı değil.
     image = Image.open(io.BytesIO(image_bytes))
+    width, height = image.size
+    
+    pixels_needed = -(-channel_count // 3)
+    rows_needed = min(height, -(-pixels_needed // width))
+    
+    if (
+        image.format == 'PNG'
+        and not image.info.get('interlace')
+        and rows_needed < height
+        and not _load_rows(image, rows_needed)
+    ):
+        image = Image.open(io.BytesIO(image_bytes))
+    
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    return np.asarray(image, dtype=np.uint8).reshape(-1)[:channel_count]
+
+
+def _pack_symbols(payload: bytes, bits_per_channel: int) -> np.ndarray:
+    # Yük bitlerini kanal başına bits_per_channel bitlik değerlere böler (MSB önce)
+    bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+    remainder = bits.size % bits_per_channel
+    if remainder:
+        bits = np.concatenate([bits, np.zeros(bits_per_channel - remainder, dtype=np.uint8)])
+    
+    if bits_per_channel == 1:
+        return bits
+    
+    groups = bits.reshape(-1, bits_per_channel)
+    symbols = groups[:, 0].copy()
+    for i in range(1, bits_per_channel):
+        symbols <<= 1
+        symbols |= groups[:, i]
+    return symbols
+
+
+def _unpack_symbols(channels: np.ndarray, bits_per_channel: int, length: int) -> bytes:
+    if bits_per_channel == 1:
+        bits = channels[:length * 8]
+    else:
+        bits = np.unpackbits(channels.reshape(-1, 1), axis=1)[:, 8 - bits_per_channel:].reshape(-1)
+    return np.packbits(bits[:length * 8]).tobytes()
+
+
+def _channels_for(length: int, bits_per_channel: int) -> int:
+    return -(-(length * 8) // bits_per_channel)
+
+
+def payload_capacity(width: int, height: int, bits_per_channel: int = 1) -> int:
+    channels = width * height * 3 - HEADER_BITS
+    return max(0, channels * bits_per_channel // 8)
+
+
+def embed_payload(image: Image.Image, payload: bytes, bits_per_channel: int = 1) -> Image.Image:
+    # v1 formatı: başlık her zaman 1 bit/kanal, yük başlığın hemen ardından bits_per_channel bit/kanal
+    if not 1 <= bits_per_channel <= MAX_BITS_PER_CHANNEL:
+        raise ValueError(f"bits_per_channel 1 ile {MAX_BITS_PER_CHANNEL} arasında olmalı")
     
     if image.mode != 'RGB':
         image = image.convert('RGB')
     
-    pixels = image.load()
     width, height = image.size
+    if len(payload) > payload_capacity(width, height, bits_per_channel):
+        raise ValueError("Yük resmin kapasitesini aşıyor")
     
-    bits_needed = 64
-    bits = []
-    bit_count = 0
-    
-    for y in range(height):
-        for x in range(width):
-            if bit_count >= bits_needed:
-                break
-            
-            r, g, b = pixels[x, y]
-            
-            if bit_count < bits_needed:
-                bits.append(r & 1)
-                bit_count += 1
-            
-            if bit_count < bits_needed:
-                bits.append(g & 1)
-                bit_count += 1
-            
-            if bit_count < bits_needed:
-                bits.append(b & 1)
-                bit_count += 1
-        
-        if bit_count >= bits_needed:
-            break
-    
-    password_bytes = []
-    for i in range(0, 64, 8):
-        byte_bits = bits[i:i+8]
-        byte_value = 0
-        for bit in byte_bits:
-            byte_value = (byte_value << 1) | bit
-        password_bytes.append(byte_value)
-    
-    return bytes(password_bytes).decode('utf-8')
-
-
-def embed_password_in_image(image_path: str, password: str, output_path: str) -> None:
-    if len(password) != 8:
-        raise ValueError("Parola tam 8 karakter olmalı!")
+    header = HEADER_FORMAT.pack(MAGIC, FORMAT_VERSION, bits_per_channel, len(payload), zlib.crc32(payload))
+    header_bits = np.unpackbits(np.frombuffer(header, dtype=np.uint8))
+    symbols = _pack_symbols(payload, bits_per_channel)
+    mask = (0xFF << bits_per_channel) & 0xFF
+    
+    pixels = np.array(image, dtype=np.uint8)
+    flat = pixels.reshape(-1)
+    flat[:HEADER_BITS] = (flat[:HEADER_BITS] & 0xFE) | header_bits
+    end = HEADER_BITS + symbols.size
+    flat[HEADER_BITS:end] = (flat[HEADER_BITS:end] & mask) | symbols
+    
+    return Image.fromarray(pixels, 'RGB')
+
+
+def extract_payload(image_bytes: bytes) -> bytes:
+    # Başlık yoksa eski format kabul edilir: ilk 64 kanalın LSB'sindeki 8 baytlık parola
+    channels = read_channel_prefix(image_bytes, HEADER_BITS)
+    if channels.size < PASSWORD_BITS:
+        raise ValueError("Resim parolayı taşıyacak kadar büyük değil")
+    
+    header = np.packbits(channels[:HEADER_BITS] & 1).tobytes()
+    if channels.size < HEADER_BITS or not header.startswith(MAGIC):
+        return np.packbits(channels[:PASSWORD_BITS] & 1).tobytes()
+    
+    _, version, bits_per_channel, length, checksum = HEADER_FORMAT.unpack(header)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Desteklenmeyen stego format sürümü: {version}")
+    if not 1 <= bits_per_channel <= MAX_BITS_PER_CHANNEL:
+        raise ValueError("Geçersiz stego başlığı")
+    
+    payload_channels = _channels_for(length, bits_per_channel)
+    channels = read_channel_prefix(image_bytes, HEADER_BITS + payload_channels)
+    if channels.size < HEADER_BITS + payload_channels:
+        raise ValueError("Stego yükü resimde eksik")
+    
+    mask = (1 << bits_per_channel) - 1
+    payload = _unpack_symbols(channels[HEADER_BITS:] & mask, bits_per_channel, length)
+    if zlib.crc32(payload) != checksum:
+        raise ValueError("Stego yükü sağlama toplamı tutmuyor")
+    
+    return payload
+
+
+def extract_password_from_image(image_bytes: bytes) -> str:
+    
+    return extract_payload(image_bytes).decode('utf-8')
+
+
+def embed_payload_in_image(image_path: str, payload: bytes, output_path: str, bits_per_channel: int = 1) -> None:
+    
+    embed_payload(Image.open(image_path), payload, bits_per_channel).save(output_path, 'PNG')
+
+
+def embed_password_in_image(image_path: str, password: str, output_path: str, bits_per_channel: int = 1) -> None:
+    password_bytes = password.encode('utf-8')
+    if not password_bytes:
+        raise ValueError("Parola boş olamaz!")
+    
+    # 8 baytlık parolalar istemcinin de okuyabildiği eski 64 bit formatında yazılır
+    if len(password_bytes) != PASSWORD_LENGTH or bits_per_channel != 1:
+        embed_payload_in_image(image_path, password_bytes, output_path, bits_per_channel)
+        return
     
     image = Image.open(image_path)
     if image.mode != 'RGB':
         image = image.convert('RGB')
     
-    pixels = image.load()
-    width, height = image.size
+    bits = np.unpackbits(np.frombuffer(password_bytes, dtype=np.uint8))
+    
+    pixels = np.array(image, dtype=np.uint8)
+    flat = pixels.reshape(-1)
+    if flat.size < bits.size:
+        raise ValueError("Resim parolayı taşıyacak kadar büyük değil")
     
-    bits = []
-    for byte in password.encode('utf-8'):
-        for i in range(7, -1, -1):
-            bits.append((byte >> i) & 1)
-    
-    bit_index = 0
-    for y in range(height):
-        for x in range(width):
-            if bit_index >= len(bits):
-                break
-            
-            r, g, b = pixels[x, y]
-            
-            if bit_index < len(bits):
-                r = (r & 0xFE) | bits[bit_index]
-                bit_index += 1
-            
-            if bit_index < len(bits):
-                g = (g & 0xFE) | bits[bit_index]
-                bit_index += 1
-            
-            if bit_index < len(bits):
-                b = (b & 0xFE) | bits[bit_index]
-                bit_index += 1
-            
-            pixels[x, y] = (r, g, b)
-        
-        if bit_index >= len(bits):
-            break
-    
-    image.save(output_path, 'PNG')
+    flat[:bits.size] = (flat[:bits.size] & 0xFE) | bits
+    
+    Image.fromarray(pixels, 'RGB').save(output_path, 'PNG')
 
 
 if __name__ == "__main__":
@@ -113,3 +203,55 @@ if __name__ == "__main__":
     
     assert password == extracted
     print("✓ Test başarılı!")
+    
+    print()
+    print("=== Stego v1 Test ===")
+    for bits_per_channel in range(1, MAX_BITS_PER_CHANNEL + 1):
+        payload = bytes(range(256)) * 11 * bits_per_channel
+        embed_payload_in_image('/tmp/test_original.png', payload, '/tmp/test_stego_v1.png', bits_per_channel)
+        with open('/tmp/test_stego_v1.png', 'rb') as f:
+            assert extract_payload(f.read()) == payload
+        print(f"✓ {bits_per_channel} bit/kanal, {len(payload)} bayt")
+    
+    embed_password_in_image('/tmp/test_original.png', "uzun parola 🔐", '/tmp/test_stego_v1.png')
+    with open('/tmp/test_stego_v1.png', 'rb') as f:
+        assert extract_password_from_image(f.read()) == "uzun parola 🔐"
+    print("✓ Değişken uzunluklu parola")
+    
+    print()
+    print("=== Kısmi çözme Test ===")
+    
+    def png_chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    
+    def raw_png(pixels: np.ndarray, interlace: bool = False, idat_size: int = 0) -> bytes:
+        # Pillow taramalı PNG yazamadığı için dosya elle kurulur (Adam7 geçişleri, filtre 0)
+        height, width, _ = pixels.shape
+        passes = [(0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2)]
+        raw = b''
+        for x0, y0, dx, dy in passes if interlace else [(0, 0, 1, 1)]:
+            sub = pixels[y0::dy, x0::dx]
+            if sub.size:
+                raw += b''.join(b'\x00' + row.tobytes() for row in sub)
+        data = zlib.compress(raw)
+        step = idat_size or len(data)
+        return (
+            b'\x89PNG\r\n\x1a\n'
+            + png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, int(interlace)))
+            + b''.join(png_chunk(b'IDAT', data[i:i + step]) for i in range(0, len(data), step))
+            + png_chunk(b'IEND', b'')
+        )
+    
+    payload = bytes(range(256)) * 3
+    noise = Image.fromarray(np.random.default_rng(7).integers(0, 256, (120, 90, 3), dtype=np.uint8), 'RGB')
+    pixels = np.array(embed_payload(noise, payload, 2), dtype=np.uint8)
+    for name, image_bytes in (
+        ("taramalı", raw_png(pixels, interlace=True)),
+        ("çoklu IDAT", raw_png(pixels, idat_size=97)),
+        ("taramalı, çoklu IDAT", raw_png(pixels, interlace=True, idat_size=97)),
+    ):
+        with Image.open(io.BytesIO(image_bytes)) as check:
+            assert np.array_equal(np.asarray(check.convert('RGB')), pixels)
+        assert np.array_equal(read_channel_prefix(image_bytes, 1000), pixels.reshape(-1)[:1000])
+        assert extract_payload(image_bytes) == payload
+        print(f"✓ {name}")
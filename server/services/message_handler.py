@@ -1,32 +1,98 @@
 
 
-from services.crypto_service import des_encrypt, des_decrypt
+from config import WRITE_BEHIND_ENABLED
+from log import get_logger
+from services.metrics import SEND_STAGE_SECONDS
+from services.crypto_service import des_encrypt, des_decrypt, is_stream_ciphertext, transcode_text
+from sqlalchemy import select, update
+from collections import OrderedDict, namedtuple
 from datetime import datetime
+import threading
+import time
 
 
-def process_message(cipher_from_client: str, sender_password: str, receiver_password: str) -> str:
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL_SECONDS = 300
+
+logger = get_logger(__name__)
+
+CachedUser = namedtuple("CachedUser", ["id", "username", "password", "is_online", "key_version"])
+
+
+class UserCache:
+    # Süreç içi LRU + TTL önbellek: user_id -> (username, password, is_online, key_version)
     
-    print(f"🔄 Processing message:")
-    print(f"  - Cipher length: {len(cipher_from_client)}")
-    print(f"  - Sender password: {sender_password}")
-    print(f"  - Receiver password: {receiver_password}")
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl_seconds: float = USER_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
     
-    try:
-        plain_text = des_decrypt(cipher_from_client, sender_password)
-        print(f"  ✅ Decrypted: {plain_text}")
+    async def get(self, db, user_id: int):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        
+        from models import User
         
-        cipher_for_recipient = des_encrypt(plain_text, receiver_password)
-        print(f"  ✅ Re-encrypted for recipient")
+        row = (await db.execute(
+            select(User.id, User.username, User.password, User.is_online, User.key_version).where(User.id == user_id)
+        )).first()
+        if row is None:
+            return None
         
-        return cipher_for_recipient
-    except Exception as e:
-        print(f"  ❌ Error in process_message: {e}")
-        import traceback
-        traceback.print_exc()
-        raise
+        user = CachedUser(row.id, row.username, row.password, row.is_online, row.key_version)
+        self.put(user)
+        return user
+    
+    def put(self, user: CachedUser):
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl_seconds, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
 
+user_cache = UserCache()
 
-def save_message_to_db(db, sender_id: int, receiver_id: int, encrypted_content: str, is_delivered: bool = False):
+
+def process_message(cipher_from_client: str, sender_password: str, receiver_password: str) -> str:
+    # Şifreler ve düz metin loglanmaz; hata çağırana bırakılır
+    if is_stream_ciphertext(cipher_from_client):
+        # Akış biçimi parça parça yeniden şifrelenir, biçim korunur
+        with SEND_STAGE_SECONDS.time("transcode"):
+            return transcode_text(cipher_from_client, sender_password, receiver_password)
+    with SEND_STAGE_SECONDS.time("decrypt"):
+        plain_text = des_decrypt(cipher_from_client, sender_password)
+    with SEND_STAGE_SECONDS.time("encrypt"):
+        return des_encrypt(plain_text, receiver_password)
+
+
+async def save_message_to_db(db, sender_id: int, receiver_id: int, encrypted_content: str, is_delivered: bool = False, sender_encrypted_content: str = None, client_message_id: str = None, attachment_id: int = None):
     
     from models import Message
     
@@ -34,56 +100,194 @@ def save_message_to_db(db, sender_id: int, receiver_id: int, encrypted_content:
         sender_id=sender_id,
         receiver_id=receiver_id,
         encrypted_content=encrypted_content,
+        sender_encrypted_content=sender_encrypted_content,
+        client_message_id=client_message_id,
+        attachment_id=attachment_id,
         is_delivered=is_delivered
     )
     
+    if WRITE_BEHIND_ENABLED:
+        # Toplu yazım: commit edilen partiden id ve created_at döner
+        from services.write_behind import write_behind
+        message.id, message.created_at = await write_behind.insert_message({
+            "sender_id": sender_id,
+            "receiver_id": receiver_id,
+            "encrypted_content": encrypted_content,
+            "sender_encrypted_content": sender_encrypted_content,
+            "client_message_id": client_message_id,
+            "attachment_id": attachment_id,
+            "is_delivered": is_delivered
+        })
+        return message
+    
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    await db.commit()
+    await db.refresh(message)
     
     return message
 
 
-def get_pending_messages(db, receiver_id: int):
+async def get_message_by_client_id(db, sender_id: int, client_message_id: str):
     
     from models import Message
     
-    return db.query(Message).filter(
+    result = await db.execute(
+        select(Message).where(
+            Message.sender_id == sender_id,
+            Message.client_message_id == client_message_id
+        )
+    )
+    return result.scalars().first()
+
+
+async def get_pending_messages(db, receiver_id: int, after_id: int = 0, limit: int = None):
+    
+    from models import Message
+    
+    # Keyset: id sırasıyla, istemcinin son gördüğü mesajdan sonrası
+    query = select(Message).where(
         Message.receiver_id == receiver_id,
-        Message.is_delivered == False
-    ).order_by(Message.created_at).all()
+        Message.is_delivered == False,
+        Message.id > after_id
+    ).order_by(Message.id)
+    if limit is not None:
+        query = query.limit(limit)
+    
+    result = await db.execute(query)
+    return result.scalars().all()
 
 
-def mark_messages_delivered(db, receiver_id: int):
+async def mark_messages_delivered(db, receiver_id: int, up_to_id: int = None):
     
     from models import Message
     
-    db.query(Message).filter(
+    if WRITE_BEHIND_ENABLED:
+        from services.write_behind import write_behind
+        await write_behind.mark_delivered(receiver_id, up_to_id)
+        return
+    
+    query = update(Message).where(
         Message.receiver_id == receiver_id,
         Message.is_delivered == False
-    ).update({"is_delivered": True})
+    )
+    if up_to_id is not None:
+        query = query.where(Message.id <= up_to_id)
     
-    db.commit()
+    await db.execute(query.values(is_delivered=True))
+    await db.commit()
 
 
-def get_user_password(db, user_id: int) -> str:
+async def mark_messages_read(db, message_ids):
     
-    from models import User
+    from models import Message
     
-    user = db.query(User).filter(User.id == user_id).first()
+    if WRITE_BEHIND_ENABLED:
+        from services.write_behind import write_behind
+        await write_behind.mark_read(message_ids)
+        return
+    
+    await db.execute(
+        update(Message).where(Message.id.in_(message_ids)).values(
+            is_read=True, is_delivered=True
+        )
+    )
+    await db.commit()
+
+
+async def get_user_password(db, user_id: int) -> str:
+    
+    user = await user_cache.get(db, user_id)
     if not user:
-        print(f"❌ User {user_id} not found")
+        logger.warning("User %s not found", user_id)
         return None
     
-    print(f"🔑 Retrieved password for user {user_id} ({user.username}): '{user.password}'")
     return user.password
 
 
-def get_user_by_username(db, username: str):
+async def set_user_online(db, user_id: int, is_online: bool):
     
     from models import User
     
-    return db.query(User).filter(User.username == username).first()
+    result = await db.execute(
+        update(User).where(User.id == user_id).values(is_online=is_online).returning(User.username)
+    )
+    username = result.scalar()
+    await db.commit()
+    user_cache.invalidate(user_id)
+    return username
+
+
+async def set_password_hash(db, user_id: int, password_hash: str):
+    
+    from models import User
+    
+    await db.execute(update(User).where(User.id == user_id).values(password_hash=password_hash))
+    await db.commit()
+
+
+async def create_attachment(db, sender_id: int, receiver_id: int, file_name: str, media_type: str, size: int):
+    
+    from models import Attachment
+    
+    attachment = Attachment(
+        sender_id=sender_id,
+        receiver_id=receiver_id,
+        file_name=file_name,
+        media_type=media_type,
+        size=size,
+        received_size=0,
+        is_complete=False
+    )
+    
+    db.add(attachment)
+    await db.commit()
+    await db.refresh(attachment)
+    
+    return attachment
+
+
+async def get_attachment(db, attachment_id: int):
+    
+    from models import Attachment
+    
+    result = await db.execute(select(Attachment).where(Attachment.id == attachment_id))
+    return result.scalars().first()
+
+
+async def update_attachment(db, attachment_id: int, **values):
+    
+    from models import Attachment
+    
+    await db.execute(update(Attachment).where(Attachment.id == attachment_id).values(**values))
+    await db.commit()
+
+
+async def get_user_by_username(db, username: str):
+    
+    from models import User
+    
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+
+async def create_user(db, username: str, stego_digest: str, password: str, password_hash: str = None):
+    
+    from models import User
+    
+    user = User(
+        username=username,
+        stego_digest=stego_digest,
+        password=password,
+        password_hash=password_hash,
+        is_online=False
+    )
+    
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    user_cache.invalidate(user.id)
+    
+    return user
 
 
 if __name__ == "__main__":
@@ -0,0 +1,220 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence
+
+
+# Prometheus metin formatı (0.0.4); bağımlılık yok, kayıt maliyeti bir bisect + kilitli artırım
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Saniye; aşamaların çoğu milisaniye altında
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self.lock:
+            values = list(self.values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}" for labels, v in values]
+        return lines
+
+
+class Gauge:
+    # Değer kazıma (scrape) anında fonksiyondan okunur; sıcak yolda maliyeti yok.
+    # Fonksiyon tek sayı, etiket demeti -> sayı sözlüğü ya da None (ölçüm yok) döner
+
+    def __init__(self, name: str, documentation: str, function: Callable,
+                 labelnames: Sequence[str] = (), kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def collect(self) -> List[str]:
+        value = self.function()
+        if value is None:
+            return []
+        series = value.items() if isinstance(value, dict) else [((), value)]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}" for labels, v in series]
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Histogram:
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # etiketler -> [kova sayıları (kümülatif değil)..., +Inf, toplam]
+        self.series: Dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labels) -> _Timer:
+        return _Timer(self, labels)
+
+    def collect(self) -> List[str]:
+        with self.lock:
+            snapshot = [(labels, list(series)) for labels, series in self.series.items()]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bounds = self.buckets + (float("inf"),)
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            suffix = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.collect()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "securechat_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status")
+))
+
+SEND_STAGE_SECONDS = registry.register(Histogram(
+    "securechat_send_stage_duration_seconds",
+    "Time spent in each stage of message send",
+    ("stage",)
+))
+
+
+class MetricsMiddleware:
+    # Saf ASGI ara katmanı (BaseHTTPMiddleware'in görev/kuyruk maliyeti yok).
+    # Etiket yol şablonudur (/messages/{me_id}/{other_id}); eşleşmeyen yollar tek etikette toplanır
+
+    def __init__(self, app, histogram: Histogram = HTTP_REQUEST_SECONDS):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.histogram.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status
+            )
+
+
+if __name__ == "__main__":
+    histogram = Histogram("test_seconds", "test", ("stage",), buckets=(0.01, 0.1))
+    histogram.observe(0.005, "a")
+    histogram.observe(0.01, "a")
+    histogram.observe(0.5, "a")
+    lines = histogram.collect()
+    assert 'test_seconds_bucket{stage="a",le="0.01"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="a"} 3' in lines
+
+    gauge = Gauge("test_depth", "test", lambda: {("x",): 3}, ("queue",))
+    assert gauge.collect()[-1] == 'test_depth{queue="x"} 3'
+    assert Gauge("test_none", "test", lambda: None).collect() == []
+
+    count = 200_000
+    start = time.perf_counter()
+    for _ in range(count):
+        with histogram.time("b"):
+            pass
+    print(f"Histogram timer: {(time.perf_counter() - start) / count * 1e6:.2f} µs/observation")
+    print("✓ Metrics test başarılı!")
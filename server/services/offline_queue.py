@@ -0,0 +1,108 @@
+import asyncio
+from collections import deque
+from typing import Optional
+
+from config import PENDING_ACK_TIMEOUT, PENDING_BATCH_SIZE, PENDING_WINDOW
+from database import AsyncSessionLocal
+from log import get_logger
+from services.connection_manager import Connection, ConnectionManager
+from services.message_handler import get_pending_messages, mark_messages_delivered
+
+
+logger = get_logger(__name__)
+
+
+def pending_item(message) -> dict:
+    return {
+        "message_id": message.id,
+        "sender_id": message.sender_id,
+        "receiver_id": message.receiver_id,
+        "encrypted_content": message.encrypted_content,
+        "attachment_id": message.attachment_id,
+        # Teslim durumu istemcinin pending_ack'i ile değişir; gönderim anındaki kayıtlı durum iletilir
+        "status": message.status,
+        "created_at": message.created_at.isoformat() if message.created_at else None
+    }
+
+
+class PendingFlush:
+    # Bağlantı açılınca iletilmemiş mesajlar "pending" partileri halinde gönderilir.
+    # İstemci her partiyi {"type": "pending_ack", "last_id": ...} ile onaylar; is_delivered toplu güncellenir.
+    # Onaysız kalan partiler bir sonraki bağlantıda last_seen_id'den itibaren tekrar gönderilir
+
+    def __init__(self, connection_manager: ConnectionManager, connection: Connection, user_id: int,
+                 last_seen_id: Optional[int] = None, batch_size: int = PENDING_BATCH_SIZE,
+                 window: int = PENDING_WINDOW, ack_timeout: float = PENDING_ACK_TIMEOUT):
+        self.manager = connection_manager
+        self.connection = connection
+        self.user_id = user_id
+        self.last_seen_id = last_seen_id or 0
+        self.batch_size = batch_size
+        self.ack_timeout = ack_timeout
+        self.window = asyncio.Semaphore(window)
+        self.outstanding = deque()
+        self.acked_id = self.last_seen_id
+        self.sent_id = self.last_seen_id
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    async def run(self):
+        # Her sorgu kendi kısa ömürlü oturumunu açar: pencere beklenirken havuzdan bağlantı tutulmaz,
+        # ack() ve diğer istekler bağlantı bulabilir
+        if self.last_seen_id:
+            # İstemcide zaten olan mesajlar
+            async with AsyncSessionLocal() as db:
+                await mark_messages_delivered(db, self.user_id, up_to_id=self.last_seen_id)
+
+        after_id = self.last_seen_id
+        while True:
+            try:
+                # Pencere dolu: istemcinin önceki partileri onaylamasını bekle
+                await asyncio.wait_for(self.window.acquire(), self.ack_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Pending flush stalled for user %s at id %s", self.user_id, after_id)
+                return
+
+            async with AsyncSessionLocal() as db:
+                rows = await get_pending_messages(db, self.user_id, after_id=after_id, limit=self.batch_size + 1)
+                more = len(rows) > self.batch_size
+                items = [pending_item(m) for m in rows[:self.batch_size]]
+            if items:
+                after_id = items[-1]["message_id"]
+                self.sent_id = after_id
+                self.outstanding.append(after_id)
+            else:
+                self.window.release()
+
+            await self.manager.send_to_connection({
+                "type": "pending",
+                "messages": items,
+                "last_id": after_id,
+                "more": more
+            }, self.connection)
+
+            if not more:
+                return
+
+    async def ack(self, last_id: int):
+        if not isinstance(last_id, int) or isinstance(last_id, bool):
+            return
+        # Gönderilmemiş mesajlar onaylanamaz
+        last_id = min(last_id, self.sent_id)
+        if last_id <= self.acked_id:
+            return
+        # Onaylar kümülatif: last_id'ye kadar olan tüm partiler
+        while self.outstanding and self.outstanding[0] <= last_id:
+            self.outstanding.popleft()
+            self.window.release()
+        self.acked_id = last_id
+
+        async with AsyncSessionLocal() as db:
+            await mark_messages_delivered(db, self.user_id, up_to_id=last_id)
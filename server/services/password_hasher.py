@@ -0,0 +1,239 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from config import (
+    AUTH_MAX_PENDING,
+    LOGIN_NEGATIVE_CACHE_SIZE,
+    LOGIN_NEGATIVE_CACHE_TTL_SECONDS,
+    LOGIN_RATE_LIMIT_ATTEMPTS,
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+    PASSWORD_HASH_N,
+    PASSWORD_HASH_P,
+    PASSWORD_HASH_R
+)
+from services.executors import run_auth
+from services.metrics import Counter, registry
+
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+# İzlenen kullanıcı adı sayısı sınırı (rastgele adlarla bellek şişirilemesin)
+RATE_LIMIT_MAX_USERNAMES = 100_000
+# Negatif önbellekte kullanıcı adı başına tutulan en fazla hatalı parola
+NEGATIVE_PER_USERNAME = 32
+
+AUTH_ATTEMPTS = registry.register(Counter(
+    "securechat_login_attempts_total",
+    "Login password checks by outcome",
+    ("result",)
+))
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def hash_password(password: str, n: int = PASSWORD_HASH_N, r: int = PASSWORD_HASH_R, p: int = PASSWORD_HASH_P) -> str:
+    # "scrypt$n$r$p$salt$hash"; parametreler özetle saklanır, ayar değişince eski özetler doğrulanmaya devam eder
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                            maxmem=256 * n * r + 1024 * 1024, dklen=HASH_BYTES)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    try:
+        scheme, n, r, p, salt, expected = encoded.split("$")
+        n, r, p = int(n), int(r), int(p)
+        salt, expected = base64.b64decode(salt), base64.b64decode(expected)
+    except ValueError:
+        return False
+    if scheme != "scrypt":
+        return False
+    digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                            maxmem=256 * n * r + 1024 * 1024, dklen=len(expected))
+    return hmac.compare_digest(digest, expected)
+
+
+class LoginRejected(Exception):
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class LoginGuard:
+    # Parola doğrulaması ayrı süreç havuzunda; olay döngüsü ve sohbet trafiği giriş yükünden etkilenmez.
+    # Sıradaki doğrulama sayısı sınırlı (aşılırsa 503), kullanıcı adı başına hatalı denemeler için kayan pencere (aşılırsa 429),
+    # yakın zamanda reddedilen (kullanıcı adı, parola) çiftleri özet hesaplanmadan reddedilir.
+    # Kayıt ve başarılı giriş o kullanıcı adının negatif kayıtlarını siler
+
+    def __init__(self, max_pending: int = AUTH_MAX_PENDING,
+                 rate_limit: int = LOGIN_RATE_LIMIT_ATTEMPTS,
+                 rate_window: float = LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+                 negative_ttl: float = LOGIN_NEGATIVE_CACHE_TTL_SECONDS,
+                 negative_size: int = LOGIN_NEGATIVE_CACHE_SIZE):
+        self.max_pending = max_pending
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.negative_ttl = negative_ttl
+        self.negative_size = negative_size
+        self.pending = 0
+        self.attempts: "OrderedDict[str, deque]" = OrderedDict()
+        # kullanıcı adı -> {HMAC(kullanıcı adı, parola): bitiş zamanı}
+        self.negative: "OrderedDict[str, dict]" = OrderedDict()
+        # Negatif önbellek anahtarı: parolalar bellekte düz tutulmaz
+        self._key = os.urandom(32)
+
+    def _negative_key(self, username: str, password: str) -> bytes:
+        return hmac.new(self._key, f"{username}\0{password}".encode("utf-8"), hashlib.sha256).digest()
+
+    def _check_rate(self, username: str, now: float):
+        # Yalnızca hatalı denemeler sayılır; başarılı girişler (ör. birden fazla cihaz) kısıtlanmaz
+        window = self.attempts.get(username)
+        if window is None:
+            return
+        while window and window[0] <= now - self.rate_window:
+            window.popleft()
+        if len(window) >= self.rate_limit:
+            AUTH_ATTEMPTS.inc("throttled")
+            retry_after = int(window[0] + self.rate_window - now) + 1
+            raise LoginRejected(429, "Too many login attempts", retry_after)
+
+    def _record_failure(self, username: str, now: float):
+        window = self.attempts.get(username)
+        if window is None:
+            window = self.attempts[username] = deque()
+            while len(self.attempts) > RATE_LIMIT_MAX_USERNAMES:
+                self.attempts.popitem(last=False)
+        else:
+            self.attempts.move_to_end(username)
+        window.append(now)
+
+    def _is_negative(self, username: str, key: bytes, now: float) -> bool:
+        entries = self.negative.get(username)
+        expires_at = entries.get(key) if entries else None
+        if expires_at is None:
+            return False
+        if expires_at <= now:
+            del entries[key]
+            return False
+        return True
+
+    def _remember_failure(self, username: str, key: bytes, now: float):
+        entries = self.negative.get(username)
+        if entries is None:
+            entries = self.negative[username] = {}
+            while len(self.negative) > self.negative_size:
+                self.negative.popitem(last=False)
+        else:
+            self.negative.move_to_end(username)
+        entries.pop(key, None)
+        entries[key] = now + self.negative_ttl
+        while len(entries) > NEGATIVE_PER_USERNAME:
+            del entries[next(iter(entries))]
+
+    async def _run(self, func, *args):
+        # Kabul kontrolü: kuyruk doluysa istek beklemeden reddedilir
+        if self.pending >= self.max_pending:
+            AUTH_ATTEMPTS.inc("overloaded")
+            raise LoginRejected(503, "Login is busy, try again", 1)
+        self.pending += 1
+        try:
+            return await run_auth(func, *args)
+        finally:
+            self.pending -= 1
+
+    def admit(self, username: str, password: str) -> bool:
+        # Veritabanı ve özet öncesi: hız sınırı (LoginRejected) ve negatif önbellek (False)
+        now = time.monotonic()
+        self._check_rate(username, now)
+        if self._is_negative(username, self._negative_key(username, password), now):
+            AUTH_ATTEMPTS.inc("cached")
+            return False
+        return True
+
+    def reject(self, username: str, password: str):
+        # Olmayan kullanıcı adı: tekrar denemeler veritabanına gitmez (kayıt olunca forget ile silinir)
+        AUTH_ATTEMPTS.inc("bad")
+        now = time.monotonic()
+        self._record_failure(username, now)
+        self._remember_failure(username, self._negative_key(username, password), now)
+
+    def forget(self, username: str):
+        # Kullanıcı adı kaydedildi ya da doğru parolayla girildi: eski olumsuz sonuçlar geçersiz
+        self.negative.pop(username, None)
+
+    async def verify(self, username: str, password: str, encoded: Optional[str],
+                     legacy_password: Optional[str] = None) -> bool:
+        if encoded:
+            ok = await self._run(verify_password, password, encoded)
+        else:
+            # Özeti henüz olmayan eski kayıt: düz parola sabit zamanlı karşılaştırılır
+            ok = legacy_password is not None and hmac.compare_digest(
+                password.encode("utf-8"), legacy_password.encode("utf-8")
+            )
+
+        if ok:
+            AUTH_ATTEMPTS.inc("ok")
+            self.forget(username)
+        else:
+            self.reject(username, password)
+        return ok
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+
+login_guard = LoginGuard()
+
+
+if __name__ == "__main__":
+    encoded = hash_password("alice123", n=2 ** 10)
+    assert verify_password("alice123", encoded)
+    assert not verify_password("alice124", encoded)
+    assert not verify_password("alice123", "plain")
+
+    async def main():
+        from services.executors import shutdown_executors
+
+        guard = LoginGuard(max_pending=1, rate_limit=3, rate_window=60)
+        # Başarılı girişler hız sınırına sayılmaz
+        for _ in range(5):
+            assert guard.admit("alice", "alice123") and await guard.verify("alice", "alice123", encoded)
+        assert guard.admit("alice", "wrong") and not await guard.verify("alice", "wrong", encoded)
+        # İkinci hatalı deneme negatif önbellekten
+        assert not guard.admit("alice", "wrong")
+        guard.reject("alice", "wrong2")
+        guard.reject("alice", "wrong3")
+        try:
+            guard.admit("alice", "alice123")
+            raise AssertionError("rate limit")
+        except LoginRejected as e:
+            assert e.status_code == 429
+
+        # Kayıttan önceki başarısız giriş, kayıttan sonra doğru parolayı engellemez
+        guard.reject("erin", "erin1234")
+        assert not guard.admit("erin", "erin1234")
+        guard.forget("erin")
+        assert guard.admit("erin", "erin1234")
+
+        slow = hash_password("bob45678")
+        results = await asyncio.gather(
+            guard.verify("bob", "bob45678", slow), guard.verify("carol", "x", slow), return_exceptions=True
+        )
+        assert results[0] is True and isinstance(results[1], LoginRejected) and results[1].status_code == 503
+        assert await guard.verify("dave", "legacy", None, legacy_password="legacy")
+        shutdown_executors()
+
+    asyncio.run(main())
+    print(f"Attempts: {AUTH_ATTEMPTS.values}")
+    print("✓ Password hasher test başarılı!")
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Dict, Iterable, List, Set
+
+from config import PRESENCE_DEBOUNCE_SECONDS, PRESENCE_MAX_SUBSCRIPTIONS
+from services.connection_manager import Connection, ConnectionManager, manager
+
+
+class PresenceService:
+    # Çevrimiçi durumu yalnızca o kullanıcıya abone olan bağlantılara gönderilir (ters indeks)
+
+    def __init__(self, connection_manager: ConnectionManager, debounce: float = PRESENCE_DEBOUNCE_SECONDS,
+                 max_subscriptions: int = PRESENCE_MAX_SUBSCRIPTIONS):
+        self.manager = connection_manager
+        self.debounce = debounce
+        self.max_subscriptions = max_subscriptions
+        self.subscriptions: Dict[Connection, Set[int]] = {}
+        self.watchers: Dict[int, Set[Connection]] = {}
+        self.usernames: Dict[int, str] = {}
+        self.state: Dict[int, bool] = {}
+        self.published: Dict[int, bool] = {}
+        self.pending: Dict[int, asyncio.TimerHandle] = {}
+        # Süren durum yayınları; gönderim bitince kümeden çıkar
+        self.tasks: Set[asyncio.Task] = set()
+
+    def subscribe(self, connection: Connection, user_ids: Iterable[int]) -> List[int]:
+        subscribed = self.subscriptions.setdefault(connection, set())
+        for user_id in user_ids:
+            if len(subscribed) >= self.max_subscriptions:
+                break
+            if user_id in subscribed:
+                continue
+            subscribed.add(user_id)
+            self.watchers.setdefault(user_id, set()).add(connection)
+        # Anlık görüntü: abone olunan kullanıcılardan şu an çevrimiçi olanlar
+        return sorted(uid for uid in subscribed if self.state.get(uid))
+
+    def unsubscribe(self, connection: Connection, user_ids: Iterable[int]):
+        subscribed = self.subscriptions.get(connection)
+        if not subscribed:
+            return
+        for user_id in user_ids:
+            if user_id in subscribed:
+                subscribed.discard(user_id)
+                self._unwatch(user_id, connection)
+
+    def remove_connection(self, connection: Connection):
+        for user_id in self.subscriptions.pop(connection, ()):
+            self._unwatch(user_id, connection)
+
+    def _unwatch(self, user_id: int, connection: Connection):
+        watchers = self.watchers.get(user_id)
+        if watchers is not None:
+            watchers.discard(connection)
+            if not watchers:
+                del self.watchers[user_id]
+
+    def set_state(self, user_id: int, username: str, is_online: bool):
+        self.usernames[user_id] = username
+        self.state[user_id] = is_online
+        if user_id in self.pending:
+            return
+        # Pencere sonunda yalnızca son durum yayınlanır; arada gidip gelme hiç görünmez
+        loop = asyncio.get_running_loop()
+        self.pending[user_id] = loop.call_later(self.debounce, self._flush, user_id)
+
+    def _flush(self, user_id: int):
+        self.pending.pop(user_id, None)
+        is_online = self.state.get(user_id, False)
+        changed = self.published.get(user_id, False) != is_online
+        username = self.usernames.get(user_id, "")
+        if is_online:
+            self.published[user_id] = True
+        else:
+            # Çevrimdışı kullanıcı için durum tutulmaz
+            self.state.pop(user_id, None)
+            self.published.pop(user_id, None)
+            self.usernames.pop(user_id, None)
+        
+        watchers = self.watchers.get(user_id)
+        if changed and watchers:
+            message = {
+                "type": "status",
+                "user_id": user_id,
+                "username": username,
+                "is_online": is_online
+            }
+            task = asyncio.create_task(self.manager.send_to_connections(message, list(watchers)))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+
+presence = PresenceService(manager)
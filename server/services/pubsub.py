@@ -0,0 +1,323 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional, Set
+from urllib.parse import unquote, urlparse
+
+from log import get_logger
+
+
+MessageHandler = Callable[[str, dict], Awaitable[None]]
+ReconnectHandler = Callable[[], Awaitable[None]]
+
+RECONNECT_DELAY_SECONDS = 1.0
+
+logger = get_logger(__name__)
+
+
+class PubSubBackend(ABC):
+    # Süreçler (uvicorn worker'ları / sunucular) arası yayın: kanal adı + JSON yük.
+    # on_reconnect, bağlantı kopup abonelikler yenilendikten sonra çağrılır (arada kaçan yayınlar için)
+
+    @abstractmethod
+    async def connect(self, on_message: MessageHandler, on_reconnect: Optional[ReconnectHandler] = None):
+        ...
+
+    @abstractmethod
+    async def subscribe(self, *channels: str):
+        ...
+
+    @abstractmethod
+    async def publish(self, channel: str, data: dict):
+        ...
+
+    async def close(self):
+        pass
+
+
+class InProcessBackend(PubSubBackend):
+    # Tek worker: mesaj aynı süreçteki aboneye doğrudan iletilir
+
+    def __init__(self):
+        self.on_message: Optional[MessageHandler] = None
+        self.channels: Set[str] = set()
+
+    async def connect(self, on_message: MessageHandler, on_reconnect: Optional[ReconnectHandler] = None):
+        # Süreç içinde bağlantı kopmaz, on_reconnect hiç çağrılmaz
+        self.on_message = on_message
+
+    async def subscribe(self, *channels: str):
+        self.channels.update(channels)
+
+    async def publish(self, channel: str, data: dict):
+        if self.on_message is not None and channel in self.channels:
+            await self.on_message(channel, data)
+
+
+def encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode('utf-8')
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+class RespError(Exception):
+    pass
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by pub/sub server")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode('utf-8')
+    if kind == b"-":
+        raise RespError(body.decode('utf-8'))
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise RespError(f"Unexpected reply: {line!r}")
+
+
+class RedisBackend(PubSubBackend):
+    # Redis uyumlu sunucu (RESP protokolü): redis://[:şifre@]host:port veya unix:///yol/redis.sock
+    # Biri SUBSCRIBE için okuyucu, biri PUBLISH için olmak üzere iki bağlantı kullanır; ek bağımlılık gerekmez
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("redis", "unix"):
+            raise ValueError(f"Unsupported pub/sub URL: {url}")
+        self.url = parsed
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.on_message: Optional[MessageHandler] = None
+        self.on_reconnect: Optional[ReconnectHandler] = None
+        self.channels: Set[str] = set()
+        self.publisher = None
+        self.subscriber = None
+        self.reader_task: Optional[asyncio.Task] = None
+        self.publish_lock = asyncio.Lock()
+
+    async def _open(self):
+        if self.url.scheme == "unix":
+            reader, writer = await asyncio.open_unix_connection(self.url.path)
+        else:
+            reader, writer = await asyncio.open_connection(self.url.hostname or "localhost", self.url.port or 6379)
+        if self.password:
+            writer.write(encode_command("AUTH", self.password))
+            await writer.drain()
+            await read_reply(reader)
+        return reader, writer
+
+    async def connect(self, on_message: MessageHandler, on_reconnect: Optional[ReconnectHandler] = None):
+        self.on_message = on_message
+        self.on_reconnect = on_reconnect
+        self.publisher = await self._open()
+        self.subscriber = await self._open()
+        self.reader_task = asyncio.create_task(self._read_loop())
+
+    async def subscribe(self, *channels: str):
+        self.channels.update(channels)
+        if self.subscriber is not None and channels:
+            _, writer = self.subscriber
+            writer.write(encode_command("SUBSCRIBE", *channels))
+            await writer.drain()
+
+    async def publish(self, channel: str, data: dict):
+        payload = json.dumps(data)
+        async with self.publish_lock:
+            try:
+                reader, writer = self.publisher
+                writer.write(encode_command("PUBLISH", channel, payload))
+                await writer.drain()
+                await read_reply(reader)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                # Bağlantı koptuysa bir kez yeniden dene
+                self.publisher = await self._open()
+                reader, writer = self.publisher
+                writer.write(encode_command("PUBLISH", channel, payload))
+                await writer.drain()
+                await read_reply(reader)
+
+    async def _read_loop(self):
+        while True:
+            try:
+                reader, _ = self.subscriber
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        channel = reply[1].decode('utf-8')
+                        try:
+                            data = json.loads(reply[2])
+                        except ValueError:
+                            continue
+                        try:
+                            await self.on_message(channel, data)
+                        except Exception:
+                            logger.exception("Pub/sub handler error on %s", channel)
+            except asyncio.CancelledError:
+                raise
+            except (ConnectionError, OSError, asyncio.IncompleteReadError, RespError) as e:
+                logger.warning("Pub/sub connection lost: %s, reconnecting", e)
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+                try:
+                    self.subscriber = await self._open()
+                    if self.channels:
+                        _, writer = self.subscriber
+                        writer.write(encode_command("SUBSCRIBE", *self.channels))
+                        await writer.drain()
+                except OSError:
+                    continue
+                if self.on_reconnect is not None:
+                    try:
+                        await self.on_reconnect()
+                    except Exception:
+                        logger.exception("Pub/sub reconnect handler error")
+
+    async def close(self):
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+            try:
+                await self.reader_task
+            except asyncio.CancelledError:
+                pass
+        for connection in (self.publisher, self.subscriber):
+            if connection is not None:
+                connection[1].close()
+        self.publisher = self.subscriber = None
+
+
+def create_backend(url: str) -> PubSubBackend:
+    if url.startswith("memory://"):
+        return InProcessBackend()
+    return RedisBackend(url)
+
+
+class LocalBroker:
+    # Geliştirme/test için Redis yerine kullanılabilen küçük RESP sunucusu (yalnızca SUBSCRIBE/PUBLISH/PING)
+
+    def __init__(self):
+        self.subscribers = {}
+        self.server = None
+        self.clients = {}
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        channels = set()
+        self.clients[writer] = asyncio.current_task()
+        try:
+            while True:
+                command = await read_reply(reader)
+                name = command[0].decode('utf-8').upper()
+                if name == "SUBSCRIBE":
+                    for channel in command[1:]:
+                        channels.add(channel)
+                        self.subscribers.setdefault(channel, set()).add(writer)
+                        writer.write(b"*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:%d\r\n" % (len(channel), channel, len(channels)))
+                elif name == "PUBLISH":
+                    targets = self.subscribers.get(command[1], ())
+                    for target in targets:
+                        target.write(encode_command("message", command[1], command[2]))
+                    writer.write(b":%d\r\n" % len(targets))
+                elif name in ("PING", "AUTH"):
+                    writer.write(b"+OK\r\n")
+                else:
+                    writer.write(b"-ERR unknown command\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in channels:
+                self.subscribers.get(channel, set()).discard(writer)
+            self.clients.pop(writer, None)
+            writer.close()
+
+    async def close(self):
+        self.server.close()
+        tasks = list(self.clients.values())
+        for writer in list(self.clients):
+            writer.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+
+if __name__ == "__main__":
+    async def self_test():
+        broker = LocalBroker()
+        port = await broker.start()
+
+        received = []
+        got = asyncio.Event()
+
+        async def on_message(channel, data):
+            received.append((channel, data))
+            got.set()
+
+        backend = create_backend(f"redis://127.0.0.1:{port}")
+        await backend.connect(on_message)
+        await backend.subscribe("presence")
+        await asyncio.sleep(0.1)
+        await backend.publish("presence", {"user_id": 1, "online": True})
+        await asyncio.wait_for(got.wait(), 2)
+        print(f"Redis backend: {received}")
+        assert received == [("presence", {"user_id": 1, "online": True})]
+        await backend.close()
+
+        # Bağlantı koparsa abonelik yenilenir ve on_reconnect çağrılır
+        reconnected = asyncio.Event()
+
+        async def on_reconnect():
+            reconnected.set()
+
+        received.clear()
+        got.clear()
+        backend = create_backend(f"redis://127.0.0.1:{port}")
+        await backend.connect(on_message, on_reconnect)
+        await backend.subscribe("presence")
+        await asyncio.sleep(0.1)
+        for writer in list(broker.clients):
+            writer.close()
+        await asyncio.wait_for(reconnected.wait(), RECONNECT_DELAY_SECONDS + 2)
+        await backend.publish("presence", {"user_id": 4})
+        await asyncio.wait_for(got.wait(), 2)
+        print(f"After reconnect: {received}")
+        assert received == [("presence", {"user_id": 4})]
+        await backend.close()
+        await broker.close()
+
+        memory = create_backend("memory://")
+        received.clear()
+        await memory.connect(on_message)
+        await memory.subscribe("presence")
+        await memory.publish("presence", {"user_id": 2})
+        await memory.publish("other", {"user_id": 3})
+        print(f"In-process backend: {received}")
+        assert received == [("presence", {"user_id": 2})]
+
+        class Partial(PubSubBackend):
+            async def connect(self, on_message, on_reconnect=None):
+                pass
+
+        try:
+            Partial()
+            raise AssertionError("abstract")
+        except TypeError:
+            pass
+        print("✓ Pub/sub test başarılı!")
+
+    asyncio.run(self_test())
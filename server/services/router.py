@@ -0,0 +1,193 @@
+import asyncio
+import time
+import uuid
+from typing import Dict, Set
+
+from config import PUBSUB_HEARTBEAT_SECONDS, PUBSUB_URL
+from log import get_logger
+from services.connection_manager import ConnectionManager, manager
+from services.presence import PresenceService, presence
+from services.pubsub import PubSubBackend, create_backend
+
+
+logger = get_logger(__name__)
+
+PRESENCE_CHANNEL = "presence"
+
+# Bu kadar heartbeat kaçıran worker ölü sayılır, kullanıcıları çevrimdışı olur
+WORKER_EXPIRY_HEARTBEATS = 3
+
+
+def worker_channel(worker_id: str) -> str:
+    return f"worker:{worker_id}"
+
+
+class MessageRouter:
+    # Worker'lar arası yönlendirme: hangi kullanıcı hangi worker'a bağlı (presence kanalı),
+    # canlı mesajlar ilgili worker'ın kanalına yayınlanır. Yapışkan oturum (sticky session) gerekmez
+
+    def __init__(self, backend: PubSubBackend, connection_manager: ConnectionManager,
+                 presence_service: PresenceService, heartbeat: float = PUBSUB_HEARTBEAT_SECONDS):
+        self.backend = backend
+        self.manager = connection_manager
+        self.presence = presence_service
+        self.heartbeat = heartbeat
+        self.worker_id = uuid.uuid4().hex
+        self.local_online: Dict[int, str] = {}
+        self.remote: Dict[int, Set[str]] = {}
+        self.worker_users: Dict[str, Dict[int, str]] = {}
+        self.worker_seen: Dict[str, float] = {}
+        self.heartbeat_task = None
+        # Sürmekte olan teslimatlar; stop() bunları bekler, hataları _delivery_done loglar
+        self.delivery_tasks = set()
+
+    async def start(self):
+        await self.backend.connect(self._on_message, self._on_reconnect)
+        await self.backend.subscribe(PRESENCE_CHANNEL, worker_channel(self.worker_id))
+        await self._hello()
+        self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+            self.heartbeat_task = None
+        if self.delivery_tasks:
+            await asyncio.gather(*self.delivery_tasks, return_exceptions=True)
+        try:
+            await self._publish_presence("bye")
+        except (ConnectionError, OSError):
+            pass
+        await self.backend.close()
+
+    def is_online(self, user_id: int) -> bool:
+        return self.manager.is_connected(user_id) or bool(self.remote.get(user_id))
+
+    async def deliver(self, message: dict, user_id: int):
+        if self.manager.is_connected(user_id):
+            await self.manager.send_personal_message(message, user_id)
+        for worker_id in self.remote.get(user_id, ()):
+            await self.backend.publish(
+                worker_channel(worker_id),
+                {"type": "deliver", "user_id": user_id, "message": message}
+            )
+
+    async def connection_opened(self, user_id: int, username: str):
+        # Bu worker'daki ilk bağlantı
+        if user_id in self.local_online or not self.manager.is_connected(user_id):
+            return
+        self.local_online[user_id] = username
+        self._update_presence(user_id, username)
+        await self._publish_presence("online", user_id=user_id, username=username)
+
+    async def connection_closed(self, user_id: int, username: str):
+        # Bu worker'daki son bağlantı
+        if user_id not in self.local_online or self.manager.is_connected(user_id):
+            return
+        del self.local_online[user_id]
+        self._update_presence(user_id, username)
+        await self._publish_presence("offline", user_id=user_id, username=username)
+
+    async def logout(self, user_id: int, username: str):
+        self.presence.set_state(user_id, username, False)
+        await self._publish_presence("logout", user_id=user_id, username=username)
+
+    def _update_presence(self, user_id: int, username: str):
+        # Kullanıcı herhangi bir worker'da bağlıysa çevrimiçi
+        self.presence.set_state(user_id, username, self.is_online(user_id))
+
+    async def _hello(self):
+        # Yeni ya da bağlantısı yeniden kurulan worker: kendi kullanıcılarını duyurur, diğerleri
+        # bağlı kullanıcılarının tam listesini doğrudan bu worker'a gönderir (kopukken kaçan olaylar için)
+        await self._publish_presence("hello", users=self._local_users())
+
+    async def _on_reconnect(self):
+        logger.info("Pub/sub reconnected, resyncing presence")
+        await self._hello()
+
+    def _local_users(self) -> dict:
+        return {str(uid): name for uid, name in self.local_online.items()}
+
+    async def _publish_presence(self, event: str, **fields):
+        await self.backend.publish(PRESENCE_CHANNEL, {"type": event, "worker": self.worker_id, **fields})
+
+    async def _on_message(self, channel: str, data: dict):
+        worker_id = data.get("worker")
+        event = data.get("type")
+
+        if event == "deliver":
+            # Yavaş bir istemcinin geri basıncı abonelik okuyucusunu bekletmesin
+            task = asyncio.create_task(self.manager.send_personal_message(data["message"], data["user_id"]))
+            self.delivery_tasks.add(task)
+            task.add_done_callback(self._delivery_done)
+            return
+        if worker_id == self.worker_id:
+            return
+
+        self.worker_seen[worker_id] = time.monotonic()
+        if event == "hello":
+            self._sync_worker(worker_id, data.get("users", {}))
+            # Boş liste de gönderilir: karşı taraf bu worker için eski kayıtlarını temizler
+            await self.backend.publish(worker_channel(worker_id), {
+                "type": "sync",
+                "worker": self.worker_id,
+                "users": self._local_users()
+            })
+        elif event == "sync":
+            self._sync_worker(worker_id, data.get("users", {}))
+        elif event == "online":
+            self._remote_add(worker_id, data["user_id"], data.get("username", ""))
+        elif event == "offline":
+            self._remote_remove(worker_id, data["user_id"], data.get("username", ""))
+        elif event == "logout":
+            self.presence.set_state(data["user_id"], data.get("username", ""), False)
+        elif event == "bye":
+            self._expire_worker(worker_id)
+
+    def _delivery_done(self, task: asyncio.Task):
+        self.delivery_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Pub/sub delivery failed: %s", type(task.exception()).__name__)
+
+    def _sync_worker(self, worker_id: str, users: dict):
+        # Worker'ın kullanıcı listesinin tamamı: listede olmayanlar o worker'dan düşer
+        users = {int(uid): username for uid, username in users.items()}
+        for user_id, username in list(self.worker_users.get(worker_id, {}).items()):
+            if user_id not in users:
+                self._remote_remove(worker_id, user_id, username)
+        for user_id, username in users.items():
+            self._remote_add(worker_id, user_id, username)
+
+    def _remote_add(self, worker_id: str, user_id: int, username: str):
+        self.worker_users.setdefault(worker_id, {})[user_id] = username
+        self.remote.setdefault(user_id, set()).add(worker_id)
+        self._update_presence(user_id, username)
+
+    def _remote_remove(self, worker_id: str, user_id: int, username: str):
+        self.worker_users.get(worker_id, {}).pop(user_id, None)
+        workers = self.remote.get(user_id)
+        if workers is not None:
+            workers.discard(worker_id)
+            if not workers:
+                del self.remote[user_id]
+        self._update_presence(user_id, username)
+
+    def _expire_worker(self, worker_id: str):
+        self.worker_seen.pop(worker_id, None)
+        for user_id, username in self.worker_users.pop(worker_id, {}).items():
+            self._remote_remove(worker_id, user_id, username)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            try:
+                await self._publish_presence("heartbeat")
+            except (ConnectionError, OSError) as e:
+                logger.warning("Pub/sub heartbeat failed: %s", e)
+            deadline = time.monotonic() - self.heartbeat * WORKER_EXPIRY_HEARTBEATS
+            for worker_id, seen in list(self.worker_seen.items()):
+                if seen < deadline:
+                    logger.warning("Worker %s expired", worker_id)
+                    self._expire_worker(worker_id)
+
+
+router = MessageRouter(create_backend(PUBSUB_URL), manager, presence)
@@ -0,0 +1,122 @@
+import base64
+import hashlib
+import hmac
+import json
+import re
+import secrets
+import time
+from typing import NamedTuple, Optional
+
+from config import SESSION_SECRET, SESSION_TOKEN_TTL_SECONDS
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+TOKEN_VERSION = "v1"
+# base64url (dolgusuz) parçaları; ASCII dışı ya da hatalı karakterli jetonlar imza hesaplanmadan reddedilir
+_TOKEN_PART = re.compile(r"[A-Za-z0-9_-]+")
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class SessionClaims(NamedTuple):
+    user_id: int
+    key_version: int
+    expires_at: int
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionTokens:
+    # Durumsuz oturum: "v1.<claims>.<HMAC-SHA256>"; doğrulama veritabanına gitmez.
+    # key_version kullanıcının anahtarı değişince artar; eski sürümlü jetonlar kullanıcı satırı zaten
+    # yüklenen yerlerde (mesaj gönderimi) reddedilir
+
+    def __init__(self, secret: bytes, ttl_seconds: int = SESSION_TOKEN_TTL_SECONDS):
+        self.secret = secret
+        self.ttl_seconds = ttl_seconds
+
+    def _sign(self, signing_input: str) -> str:
+        return _b64encode(hmac.new(self.secret, signing_input.encode("ascii"), hashlib.sha256).digest())
+
+    def issue(self, user_id: int, key_version: int, now: Optional[float] = None) -> str:
+        expires_at = int((now if now is not None else time.time()) + self.ttl_seconds)
+        claims = json.dumps({"uid": user_id, "kv": key_version, "exp": expires_at}, separators=(",", ":"))
+        signing_input = f"{TOKEN_VERSION}.{_b64encode(claims.encode('utf-8'))}"
+        return f"{signing_input}.{self._sign(signing_input)}"
+
+    def verify(self, token: str, now: Optional[float] = None) -> SessionClaims:
+        try:
+            version, payload, signature = token.split(".")
+        except (AttributeError, ValueError):
+            raise InvalidToken("Malformed token")
+        if not (_TOKEN_PART.fullmatch(payload) and _TOKEN_PART.fullmatch(signature)):
+            raise InvalidToken("Malformed token")
+        if version != TOKEN_VERSION:
+            raise InvalidToken("Unsupported token version")
+        # Sabit zamanlı karşılaştırma
+        if not hmac.compare_digest(self._sign(f"{version}.{payload}"), signature):
+            raise InvalidToken("Invalid signature")
+
+        try:
+            claims = json.loads(_b64decode(payload))
+            user_id, key_version, expires_at = claims["uid"], claims["kv"], claims["exp"]
+        except (ValueError, TypeError, KeyError):
+            raise InvalidToken("Malformed claims")
+        if not all(isinstance(v, int) and not isinstance(v, bool) for v in (user_id, key_version, expires_at)):
+            raise InvalidToken("Malformed claims")
+        if expires_at <= (now if now is not None else time.time()):
+            raise InvalidToken("Token expired")
+        return SessionClaims(user_id, key_version, expires_at)
+
+
+def load_secret() -> bytes:
+    if SESSION_SECRET:
+        return SESSION_SECRET.encode("utf-8")
+    # Birden fazla worker/sunucu aynı SESSION_SECRET'ı paylaşmalı
+    logger.warning("SESSION_SECRET is not set; session tokens are valid only for this process")
+    return secrets.token_bytes(32)
+
+
+session_tokens = SessionTokens(load_secret())
+
+
+if __name__ == "__main__":
+    tokens = SessionTokens(b"test-secret", ttl_seconds=60)
+    token = tokens.issue(42, 3, now=1000)
+    assert tokens.verify(token, now=1010) == SessionClaims(42, 3, 1060)
+
+    # Bozuk imza / sürüm, ASCII dışı karakterler, hatalı base64 (dolgu, uzunluk) hep InvalidToken
+    for bad in (token + "x", token.replace("v1.", "v2."), "abc", "a.b.c", token + "ş", "v1.ü.abc",
+                "v1.a=.abc", "v1.abcde." + token.split(".")[2], "v1..abc", None):
+        try:
+            tokens.verify(bad, now=1010)
+            raise AssertionError(bad)
+        except InvalidToken:
+            pass
+    try:
+        tokens.verify(token, now=1060)
+        raise AssertionError("expired")
+    except InvalidToken:
+        pass
+    try:
+        SessionTokens(b"other-secret").verify(token, now=1010)
+        raise AssertionError("secret")
+    except InvalidToken:
+        pass
+
+    count = 100_000
+    start = time.perf_counter()
+    for _ in range(count):
+        tokens.verify(token, now=1010)
+    print(f"Verify: {(time.perf_counter() - start) / count * 1e6:.2f} µs/token")
+    print("✓ Session token test başarılı!")
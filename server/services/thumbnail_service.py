@@ -0,0 +1,126 @@
+import os
+import tempfile
+import threading
+
+from PIL import Image
+
+from config import THUMBNAIL_DIR, THUMBNAIL_CACHE_MAX_BYTES
+from log import get_logger
+from services.blob_store import blob_store, validate_digest
+from services.executors import get_cpu_executor, run_cpu, run_io
+
+
+logger = get_logger(__name__)
+
+THUMBNAIL_SIZES = {"small": 64, "medium": 256}
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+THUMBNAIL_QUALITY = 80
+
+
+def thumbnail_filename(digest: str, size: str, fmt: str) -> str:
+    return f"{validate_digest(digest)}_{size}.{fmt}"
+
+
+def render_thumbnails(source_path: str, digest: str, cache_dir: str) -> list:
+    # İşçi süreçte çalışır. Kaynak yalnızca okunur; küçültme resmin bellekteki kopyası üzerinde yapılır,
+    # böylece stego baytları hiçbir zaman değişmez.
+    os.makedirs(cache_dir, exist_ok=True)
+    written = []
+    with Image.open(source_path) as source:
+        source.load()
+        base = source.convert("RGB") if source.mode != "RGB" else source.copy()
+    
+    for size, edge in THUMBNAIL_SIZES.items():
+        thumb = base.copy()
+        thumb.thumbnail((edge, edge))
+        for fmt, (pil_format, _) in THUMBNAIL_FORMATS.items():
+            path = os.path.join(cache_dir, thumbnail_filename(digest, size, fmt))
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    thumb.save(f, pil_format, quality=THUMBNAIL_QUALITY)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            written.append(os.path.getsize(path))
+    return written
+
+
+class ThumbnailCache:
+    # Diskte LRU: erişilen dosyanın mtime'ı güncellenir, sınır aşılınca en eski dosyalar silinir
+    
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._total_bytes = None
+        self._lock = threading.Lock()
+    
+    def path_for(self, digest: str, size: str, fmt: str) -> str:
+        return os.path.join(self.root, thumbnail_filename(digest, size, fmt))
+    
+    def get(self, digest: str, size: str, fmt: str):
+        path = self.path_for(digest, size, fmt)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+    
+    async def generate(self, digest: str) -> None:
+        # Önbellek ıskalamasında istek bekler ama çözme/küçültme süreç havuzunda, boyut kaydı IO havuzunda yapılır
+        sizes = await run_cpu(render_thumbnails, blob_store.path_for(digest), digest, self.root)
+        await run_io(self.record, sizes)
+    
+    def record(self, sizes: list) -> None:
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += sum(sizes)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+    
+    def _scan_total(self) -> int:
+        if not os.path.isdir(self.root):
+            return 0
+        return sum(entry.stat().st_size for entry in os.scandir(self.root) if entry.is_file())
+    
+    def _evict(self) -> None:
+        entries = sorted(
+            (entry for entry in os.scandir(self.root) if entry.is_file() and not entry.name.startswith(".tmp-")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        total = sum(entry.stat().st_size for entry in entries)
+        # Sınırın %90'ına inene kadar silinir, her yeni dosyada tekrar taranmasın
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if total <= target:
+                break
+            try:
+                total -= entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        self._total_bytes = total
+
+
+thumbnail_cache = ThumbnailCache(THUMBNAIL_DIR, THUMBNAIL_CACHE_MAX_BYTES)
+
+def schedule_thumbnails(digest: str) -> None:
+    # Kayıt sırasında küçük boyutlar istek yolunun dışında, süreç havuzunda üretilir
+    future = get_cpu_executor().submit(render_thumbnails, blob_store.path_for(digest), digest, thumbnail_cache.root)
+    
+    def _done(f):
+        if f.cancelled():
+            return
+        if f.exception() is not None:
+            logger.warning("Thumbnail generation failed for %s: %s", digest, f.exception())
+        else:
+            thumbnail_cache.record(f.result())
+    
+    future.add_done_callback(_done)
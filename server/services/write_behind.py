@@ -0,0 +1,164 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, update
+
+from config import WRITE_BEHIND_MAX_BATCH, WRITE_BEHIND_WINDOW_MS
+from database import AsyncSessionLocal
+from models import Message
+
+
+# Toplu INSERT'te her satır aynı sütunlara sahip olmalı
+MESSAGE_INSERT_COLUMNS = (
+    "sender_id",
+    "receiver_id",
+    "encrypted_content",
+    "sender_encrypted_content",
+    "client_message_id",
+    "attachment_id",
+    "is_delivered",
+)
+
+
+class WriteBehind:
+    # Mesaj kayıtları ve okundu/iletildi güncellemeleri biriktirilir, tek işlemde (tek fsync) yazılır.
+    # Parti max_batch'e ulaşınca ya da window süresi dolunca yazılır; çağıran commit sonrası yanıt alır
+
+    def __init__(self, session_factory=AsyncSessionLocal, max_batch: int = WRITE_BEHIND_MAX_BATCH,
+                 window: float = WRITE_BEHIND_WINDOW_MS / 1000):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.window = window
+        self.inserts: List[tuple] = []
+        self.reads: List[tuple] = []
+        self.deliveries: List[tuple] = []
+        self.wakeup: Optional[asyncio.Event] = None
+        self.full: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.closing = False
+        self.batches = 0
+        self.rows = 0
+
+    def pending(self) -> int:
+        return len(self.inserts) + len(self.reads) + len(self.deliveries)
+
+    def _submit(self, queue: list, item) -> asyncio.Future:
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.full = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        queue.append((item, future))
+        self.wakeup.set()
+        if self.pending() >= self.max_batch:
+            self.full.set()
+        return future
+
+    async def insert_message(self, values: dict):
+        # (id, created_at) döner
+        row = {column: values.get(column) for column in MESSAGE_INSERT_COLUMNS}
+        return await self._submit(self.inserts, row)
+
+    async def mark_read(self, message_ids: List[int]):
+        if message_ids:
+            await self._submit(self.reads, list(message_ids))
+
+    async def mark_delivered(self, receiver_id: int, up_to_id: Optional[int]):
+        await self._submit(self.deliveries, (receiver_id, up_to_id))
+
+    async def _run(self):
+        while True:
+            await self.wakeup.wait()
+            if self.pending() < self.max_batch and not self.closing:
+                try:
+                    await asyncio.wait_for(self.full.wait(), self.window)
+                except asyncio.TimeoutError:
+                    pass
+            self.wakeup.clear()
+            self.full.clear()
+
+            # Yazım sürerken gelenler bir sonraki partiye kalır (grup commit)
+            inserts, self.inserts = self.inserts, []
+            reads, self.reads = self.reads, []
+            deliveries, self.deliveries = self.deliveries, []
+            if inserts or reads or deliveries:
+                await self._flush(inserts, reads, deliveries)
+            if self.closing and not self.pending():
+                return
+
+    async def _write(self, db, inserts: list, reads: list, deliveries: list) -> list:
+        created = []
+        if inserts:
+            result = await db.execute(
+                insert(Message).returning(Message.id, Message.created_at, sort_by_parameter_order=True),
+                [row for row, _ in inserts]
+            )
+            created = [tuple(r) for r in result.all()]
+
+        read_ids = [message_id for ids, _ in reads for message_id in ids]
+        if read_ids:
+            await db.execute(
+                update(Message).where(Message.id.in_(read_ids)).values(is_read=True, is_delivered=True)
+            )
+
+        # Alıcı başına tek UPDATE: en geniş sınır yeterli
+        bounds: Dict[int, Optional[int]] = {}
+        for (receiver_id, up_to_id), _ in deliveries:
+            if up_to_id is None or bounds.get(receiver_id, 0) is None:
+                bounds[receiver_id] = None
+            else:
+                bounds[receiver_id] = max(bounds.get(receiver_id, 0), up_to_id)
+        for receiver_id, up_to_id in bounds.items():
+            query = update(Message).where(Message.receiver_id == receiver_id, Message.is_delivered == False)
+            if up_to_id is not None:
+                query = query.where(Message.id <= up_to_id)
+            await db.execute(query.values(is_delivered=True))
+        return created
+
+    async def _flush(self, inserts: list, reads: list, deliveries: list):
+        error = None
+        async with self.session_factory() as db:
+            try:
+                created = await self._write(db, inserts, reads, deliveries)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                error = e
+        
+        if error is not None:
+            if len(inserts) + len(reads) + len(deliveries) == 1:
+                for _, future in inserts + reads + deliveries:
+                    if not future.done():
+                        future.set_exception(error)
+                return
+            # Hatalı tek satır (ör. tekrar eden client_message_id) partinin geri kalanını düşürmesin
+            for item in inserts:
+                await self._flush([item], [], [])
+            for item in reads:
+                await self._flush([], [item], [])
+            for item in deliveries:
+                await self._flush([], [], [item])
+            return
+
+        self.batches += 1
+        self.rows += len(inserts) + len(reads) + len(deliveries)
+        for (_, future), row in zip(inserts, created):
+            if not future.done():
+                future.set_result(row)
+        for _, future in reads + deliveries:
+            if not future.done():
+                future.set_result(None)
+
+    async def close(self):
+        # Kapanışta bekleyen kayıtlar yazılır
+        if self.task is None or self.task.done():
+            return
+        self.closing = True
+        self.wakeup.set()
+        self.full.set()
+        await self.task
+        self.task = None
+        self.closing = False
+
+
+write_behind = WriteBehind()